@@ -1,51 +1,236 @@
+import asyncio
 import os
+import time
 import pytest
 from dotenv import load_dotenv
 from datetime import datetime
+from _pytest.runner import runtestprotocol
+from _pytest.skipping import evaluate_skip_marks
 from httpx import AsyncClient
-from pymongo.errors import ServerSelectionTimeoutError
-from motor.motor_asyncio import AsyncIOMotorClient
-from tests.report_generator import TestReportGenerator
+from tests.budget_selection import select_within_budget
+from tests.db import MONGODB_DB_NAME, connect_mongo
+from tests.fault_injection import FaultInjectingTransport, fault_summary, load_faults
+from tests.retry_policy import RetryBudget, RetryingTransport, load_retry_policy, retry_summary
+from tests.index_health import build_index_report
+from tests.instrumentation import (InstrumentedTransport, MetricsRecorder, check_payload_regressions,
+                                   load_payload_budgets, payload_baseline)
+from tests.query_profiler import QueryCapture
+from tests.report_exporters import detail_export, export_results, parse_formats
+from tests.report_generator import DETAIL_MAX_ROWS, TestReportGenerator
+from tests.report_history import HISTORY_RUNS, append_run, load_history, run_record
+from tests.rerun_stats import classify_runs
+from tests.resource_sampler import ResourceSampler
+from tests.json_codec import response_json
+from tests.utils import (DEFAULT_PASSWORD, ROUTES, generate_unique_email, get_auth_token, login_body,
+                         token_claims)
 
 
 load_dotenv()
 
+def pytest_addoption(parser):
+    parser.addoption("--resource-sampling", action="store_true", default=False,
+                     help="Sample Mongo serverStatus/dbStats (and SERVICE_METRICS_URL) during the run")
+    parser.addoption("--sampling-interval", type=float, default=1.0,
+                     help="Seconds between resource samples")
+    parser.addoption("--mongo-profile", action="store_true", default=False,
+                     help="Capture the Mongo profiler per test and flag COLLSCAN/slow queries")
+    parser.addoption("--slow-ms", type=int, default=100,
+                     help="Threshold (ms) above which a profiled query is flagged as slow")
+    parser.addoption("--index-report", action="store_true", default=False,
+                     help="Add index health and recommended indexes (from --mongo-profile query shapes) to the report")
+    parser.addoption("--payload-budgets", default=None,
+                     help="JSON file of per-route response size/decode budgets (defaults to PAYLOAD_BUDGETS)")
+    parser.addoption("--report-formats", default="pdf",
+                     help="Comma-separated report formats: pdf, json, junit, csv (e.g. pdf,junit)")
+    parser.addoption("--history-runs", type=int, default=HISTORY_RUNS,
+                     help="Runs from reports/history.jsonl to chart as trends (0 disables the history)")
+    parser.addoption("--rerun-count", type=int, default=1,
+                     help="Run every selected test K times and classify it as stable, flaky or slow-outlier")
+    parser.addoption("--faults", default=None,
+                     help="JSON fault profile injecting per-route latency, jitter, dropped connections and 5xx errors")
+    parser.addoption("--retry-policy", default=None,
+                     help="JSON per-route timeout/retry policy laid over DEFAULT_RETRY_POLICY")
+    parser.addoption("--no-retries", action="store_true", default=False,
+                     help="Disable client retries (per-route timeouts still apply)")
+    parser.addoption("--run-slow", action="store_true", default=False,
+                     help="Also run tests marked slow (volume and expiry tests that take minutes)")
+    parser.addoption("--time-budget", type=float, default=None,
+                     help="Seconds: run only the highest-value tests (from history) that fit, covering every route")
+
 @pytest.fixture(scope="session")
 def anyio_backend():
     return "asyncio"
 
 API_URL = os.getenv("API_URL", "http://localhost:8000")
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "petmatchDB_test")
+SERVICE_METRICS_URL = os.getenv("SERVICE_METRICS_URL")
+
+SESSION_METRICS = MetricsRecorder(timeline=True)
+SESSION_FAULTS = {}
+SESSION_RETRIES = {}
+SESSION_RETRY_BUDGET = RetryBudget()
+
+SHARED_ACCOUNT_FIXTURES = {"shared_account", "shared_clinic_account"}
+# Shared tokens with less than this many seconds left are replaced by a fresh login
+SHARED_TOKEN_MIN_TTL = 300
+_SHARED_ACCOUNTS = {}
+
+@pytest.fixture(scope="session")
+def faults(pytestconfig):
+    return load_faults(pytestconfig.getoption("--faults"))
+
+@pytest.fixture(scope="session")
+def retry_policy(pytestconfig):
+    policy = load_retry_policy(pytestconfig.getoption("--retry-policy"))
+    if pytestconfig.getoption("--no-retries"):
+        policy = {route: {**entry, "retries": 0} for route, entry in policy.items()}
+    return policy
 
 @pytest.fixture(scope="function")
-async def client():
-    async with AsyncClient(base_url=API_URL) as ac:
+async def client(faults, retry_policy):
+    transport = FaultInjectingTransport(faults, injected=SESSION_FAULTS) if faults else None
+    transport = InstrumentedTransport(SESSION_METRICS, transport, measure_decode=True)
+    transport = RetryingTransport(retry_policy, transport, budget=SESSION_RETRY_BUDGET, stats=SESSION_RETRIES)
+    async with AsyncClient(base_url=API_URL, transport=transport) as ac:
         yield ac
 
+async def _shared_account(client, user_type, **kwargs):
+    account = _SHARED_ACCOUNTS.get(user_type)
+    if account is None:
+        email = generate_unique_email(f"shared_{user_type}")
+        token = await get_auth_token(client, email=email, user_type=user_type, **kwargs)
+        account = _SHARED_ACCOUNTS[user_type] = {
+            "email": email,
+            "password": DEFAULT_PASSWORD,
+            "token": token,
+            "user_type": user_type,
+        }
+    elif token_claims(account["token"]).get("exp", float("inf")) - time.time() < SHARED_TOKEN_MIN_TTL:
+        response = await client.post(ROUTES["login"], **login_body(account["email"], account["password"]).request())
+        assert response.status_code == 200, "Shared account re-login failed"
+        account["token"] = response_json(response)["token"]
+    return dict(account)
+
+@pytest.fixture(scope="function")
+async def shared_account(client):
+    """Owner account provisioned once per session for read-only tests. Never log out, modify or delete it."""
+    return await _shared_account(client, "owner")
+
+@pytest.fixture(scope="function")
+async def shared_clinic_account(client):
+    """Clinic account (locality Chapinero) provisioned once per session for read-only tests"""
+    return await _shared_account(client, "clinic", name="Clínica Esperanza", locality="Chapinero")
+
+@pytest.fixture(scope="function")
+async def mongo_db():
+    client = await connect_mongo()
+    yield client[MONGODB_DB_NAME]
+    client.close()
+
 @pytest.fixture(scope="function", autouse=True)
 async def clean_test_db():
-    try:
-        client = AsyncIOMotorClient(MONGODB_URL, serverSelectionTimeoutMS=2000)
-        await client.server_info()
-    except ServerSelectionTimeoutError:
-        client = AsyncIOMotorClient("mongodb://localhost:27017")
+    client = await connect_mongo()
         
     db = client[MONGODB_DB_NAME]
-    await db["users"].delete_many({})
+    shared_emails = [account["email"] for account in _SHARED_ACCOUNTS.values()]
+    await db["users"].delete_many({"email": {"$nin": shared_emails}})
     await db["revoked_tokens"].delete_many({})
     
     yield
     
-    await db["users"].delete_many({})
+    shared_emails = [account["email"] for account in _SHARED_ACCOUNTS.values()]
+    await db["users"].delete_many({"email": {"$nin": shared_emails}})
     await db["revoked_tokens"].delete_many({})
     client.close()
 
-def pytest_sessionfinish(session, exitstatus):
-    test_results = []
+@pytest.fixture(scope="function", autouse=True)
+async def mongo_profile(request):
+    if not request.config.getoption("--mongo-profile"):
+        yield None
+        return
+
+    client = await connect_mongo()
+    capture = QueryCapture(client[MONGODB_DB_NAME], request.config.getoption("--slow-ms"))
+    await capture.start()
+
+    yield capture
+
+    await capture.collect()
+    await capture.stop()
+    request.node.mongo_operations = capture.operations
+    client.close()
+
+def pytest_sessionstart(session):
+    session.config.session_started = time.perf_counter()
+    session.config.deselected_tests = False
+    session.config.resource_sampler = None
+    if session.config.getoption("--resource-sampling"):
+        sampler = ResourceSampler(session.config.getoption("--sampling-interval"), SERVICE_METRICS_URL)
+        sampler.start()
+        session.config.resource_sampler = sampler
+
+def pytest_collection_modifyitems(config, items):
+    """Run tests on the shared accounts first, then the rest, then destructive tests.
+
+    With --time-budget, only the selected tests are kept, highest value first within each phase.
+    Tests marked slow are skipped unless --run-slow is given.
+    """
+    if not config.getoption("--run-slow"):
+        skip_slow = pytest.mark.skip(reason="Slow test; run with --run-slow")
+        for item in items:
+            if item.get_closest_marker("slow"):
+                item.add_marker(skip_slow)
+
+    budget = config.getoption("--time-budget")
+    if budget is not None:
+        history_runs = config.getoption("--history-runs")
+        history = load_history(kind="pytest", last=history_runs) if history_runs else []
+        # Skipped tests (slow without --run-slow, skip/skipif) would use up budget and cover nothing
+        runnable = [item.nodeid for item in items if evaluate_skip_marks(item) is None]
+        order = {nodeid: rank for rank, nodeid in enumerate(select_within_budget(runnable, history, budget))}
+        deselected = [item for item in items if item.nodeid not in order]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+        items[:] = sorted((item for item in items if item.nodeid in order), key=lambda item: order[item.nodeid])
+
+    def phase(item):
+        if item.get_closest_marker("destructive"):
+            return 2
+        if SHARED_ACCOUNT_FIXTURES & set(item.fixturenames):
+            return 0
+        return 1
+
+    items.sort(key=phase)
+
+def pytest_deselected(items):
+    if items:
+        items[0].config.deselected_tests = True
+
+def selection_mode(config) -> str:
+    """How the run picked its tests: "time_budget", "subset" (-k, -m, deselection or explicit tests) or "full" """
+    if config.getoption("--time-budget") is not None:
+        return "time_budget"
+    if config.deselected_tests or any(arg.endswith(".py") or "::" in arg for arg in config.args):
+        return "subset"
+    return "full"
+
+async def drop_shared_accounts():
+    client = await connect_mongo()
+    try:
+        emails = [account["email"] for account in _SHARED_ACCOUNTS.values()]
+        await client[MONGODB_DB_NAME]["users"].delete_many({"email": {"$in": emails}})
+    finally:
+        client.close()
+
+async def collect_index_report(query_shapes):
+    client = await connect_mongo()
+    try:
+        return await build_index_report(client[MONGODB_DB_NAME], query_shapes)
+    finally:
+        client.close()
+
+def iter_test_results(session):
+    """Yield one result dict per collected test"""
     for item in session.items:
-        report = item.reportinfo()
-        call = item._calling_fixtures if hasattr(item, '_calling_fixtures') else None
         outcome = 'skipped'
         duration = 0
 
@@ -55,19 +240,126 @@ def pytest_sessionfinish(session, exitstatus):
         elif hasattr(item, 'rep_setup') and item.rep_setup.skipped:
             outcome = 'skipped'
 
-        test_results.append({
+        result = {
             'name': item.name,
+            'nodeid': item.nodeid,
             'outcome': outcome,
             'duration': duration
-        })
+        }
+        if hasattr(item, 'rep_setup'):
+            result['setup_duration'] = item.rep_setup.duration
+        result['requests'] = {
+            route: {'count': count, 'seconds': seconds}
+            for route, (count, seconds) in SESSION_METRICS.context_requests.get(item.nodeid, {}).items()
+        }
+        if outcome == 'failed':
+            result['message'] = item.rep_call.longreprtext
+        if getattr(item, 'rerun_reports', None):
+            result['stability'] = classify_runs([report.outcome for report in item.rerun_reports],
+                                                [report.duration for report in item.rerun_reports])
+        if session.config.getoption("--mongo-profile"):
+            result['mongo_findings'] = [op for op in getattr(item, 'mongo_operations', []) if op['flags']]
+        yield result
+
+def pytest_sessionfinish(session, exitstatus):
+    sampler = getattr(session.config, "resource_sampler", None)
+    resource_samples = sampler.stop() if sampler else None
 
+    if _SHARED_ACCOUNTS:
+        asyncio.run(drop_shared_accounts())
+        _SHARED_ACCOUNTS.clear()
+
+    index_report = None
+    if session.config.getoption("--index-report"):
+        query_shapes = {}
+        for item in session.items:
+            for operation in getattr(item, 'mongo_operations', []):
+                key = (operation['collection'], operation['shape'])
+                query_shapes[key] = query_shapes.get(key, 0) + 1
+        index_report = asyncio.run(collect_index_report(query_shapes))
+
+    formats = parse_formats(session.config.getoption("--report-formats"))
     os.makedirs("reports", exist_ok=True)
 
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"reports/reporte_pruebas_auth_BE_{timestamp}.pdf"
+    base_path = f"reports/reporte_pruebas_auth_BE_{timestamp}"
+    latency_metrics = SESSION_METRICS.summary()
+    payload_metrics = SESSION_METRICS.payload_summary()
+    connection_metrics = SESSION_METRICS.connection_summary()
+    fault_metrics = fault_summary(load_faults(session.config.getoption("--faults")), SESSION_FAULTS)
+    retry_metrics = retry_summary(SESSION_RETRIES)
+
+    history_runs = session.config.getoption("--history-runs")
+    record_history = bool(history_runs) and not session.config.option.collectonly
+    # Baseline from earlier runs only, read before this run is appended
+    baseline = payload_baseline(load_history(kind="pytest", last=history_runs)) if record_history else {}
+
+    # The exports stream the results; only the PDF needs them all in memory
+    test_results = iter_test_results(session)
+    if "pdf" in formats:
+        test_results = list(test_results)
+        if len(test_results) > DETAIL_MAX_ROWS and "json" not in formats:
+            # The PDF only summarizes runs this large, so keep the full detail somewhere
+            formats.append("json")
+    exported = export_results(test_results, base_path, formats, latency_metrics,
+                              {"payload": payload_metrics, "connections": connection_metrics,
+                               "faults": fault_metrics, "retries": retry_metrics,
+                               "payload_regressions": check_payload_regressions(payload_metrics, baseline)})
+
+    history = []
+    if record_history:
+        if not isinstance(test_results, list):
+            test_results = list(iter_test_results(session))
+        selection = selection_mode(session.config)
+        append_run(run_record("pytest", test_results, latency_metrics, payload_metrics,
+                              duration=time.perf_counter() - session.config.session_started, selection=selection))
+        # Trends only compare runs that picked their tests the same way
+        history = load_history(kind="pytest", last=history_runs, selection=selection)
+
+    if "pdf" in formats:
+        generator = TestReportGenerator(
+            test_results,
+            latency_metrics,
+            resource_samples=resource_samples,
+            latency_timeline=SESSION_METRICS.timeline,
+            index_report=index_report,
+            payload_metrics=payload_metrics,
+            connection_metrics=connection_metrics,
+            fault_metrics=fault_metrics,
+            retry_metrics=retry_metrics,
+            payload_budgets=load_payload_budgets(session.config.getoption("--payload-budgets")),
+            payload_baseline=baseline,
+            export_path=detail_export(exported),
+            history=history,
+        )
+        generator.generate_report(f"{base_path}.pdf")
+
+def pytest_runtest_logfinish(nodeid, location):
+    SESSION_METRICS.context = None
+
+def pytest_runtest_protocol(item, nextitem):
+    """Attribute requests to the running test; with --rerun-count K, run it K times and log only the last run"""
+    SESSION_METRICS.context = item.nodeid
+    reruns = item.config.getoption("--rerun-count")
+    if reruns <= 1:
+        return None
 
-    generator = TestReportGenerator(test_results)
-    generator.generate_report(filename)
+    item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+    item.rerun_reports = []
+    for run in range(reruns):
+        last = run == reruns - 1
+        # Between runs only the test's own fixtures are torn down; module/session ones stay alive
+        reports = runtestprotocol(item, nextitem=nextitem if last else item.parent, log=False)
+        if not last and not any(report.when == 'call' for report in reports):
+            # Setup was skipped or failed, so there is nothing to re-run
+            item.session._setupstate.teardown_exact(nextitem)
+            last = True
+        if last:
+            for report in reports:
+                item.ihook.pytest_runtest_logreport(report=report)
+            break
+    item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+    return True
 
 @pytest.hookimpl(hookwrapper=True)
 def pytest_runtest_makereport(item, call):
@@ -75,5 +367,12 @@ def pytest_runtest_makereport(item, call):
     report = outcome.get_result()
     if report.when == 'call':
         item.rep_call = report
+        if hasattr(item, 'rerun_reports'):
+            item.rerun_reports.append(report)
     elif report.when == 'setup':
-        item.rep_setup = report
\ No newline at end of file
+        item.rep_setup = report
+        if report.failed:
+            # The run ends here, so the call report of an earlier run no longer describes the test
+            item.__dict__.pop('rep_call', None)
+            if hasattr(item, 'rerun_reports'):
+                item.rerun_reports.append(report)
\ No newline at end of file
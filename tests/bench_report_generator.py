@@ -0,0 +1,65 @@
+import argparse
+import random
+import statistics
+import time
+from io import BytesIO
+
+from tests import report_generator
+from tests.report_generator import TestReportGenerator
+from tests.utils import ROUTES
+
+"""
+Report build-time benchmark. Builds the same synthetic report several times
+in memory, once with the module-level template caches cleared before every
+build (the cost of a cold process) and once with them warm:
+
+    python -m tests.bench_report_generator --rows 500 --runs 10
+"""
+
+
+def synthetic_results(rows: int, seed: int = 0) -> tuple:
+    rng = random.Random(seed)
+    test_results = [{
+        "name": f"test_case_{index}",
+        "outcome": "failed" if rng.random() < 0.05 else "passed",
+        "duration": rng.uniform(0.01, 2.0),
+    } for index in range(rows)]
+    latency_metrics = {}
+    for route in ROUTES:
+        p50 = rng.uniform(0.005, 0.05)
+        latency_metrics[route] = {
+            "count": rng.randint(10, 1000), "errors": 0, "mean": p50,
+            "p50": p50, "p95": p50 * 2, "p99": p50 * 3, "max": p50 * 4,
+        }
+    return test_results, latency_metrics
+
+def clear_caches():
+    report_generator.get_styles.cache_clear()
+    report_generator.logo_bytes.cache_clear()
+
+def time_builds(test_results, latency_metrics, runs: int, cold: bool) -> list:
+    timings = []
+    for _ in range(runs):
+        if cold:
+            clear_caches()
+        started = time.perf_counter()
+        TestReportGenerator(test_results, latency_metrics).generate_report(BytesIO())
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PDF report generation")
+    parser.add_argument("--rows", type=int, default=200, help="Test results in the detailed table")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    test_results, latency_metrics = synthetic_results(args.rows)
+    for label, cold in (("cold caches", True), ("warm caches", False)):
+        timings = time_builds(test_results, latency_metrics, args.runs, cold)
+        print(f"{label:12} mean {statistics.mean(timings) * 1000:8.1f} ms   "
+              f"min {min(timings) * 1000:8.1f} ms   max {max(timings) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
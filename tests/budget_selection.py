@@ -0,0 +1,72 @@
+import statistics
+
+from tests.utils import ROUTES, module_routes
+
+"""
+Time-budgeted test selection for smoke gates. Per-test durations and failure
+rates come from the run history; the routes a test covers are the ones its
+module targets (module_routes), not every route it happened to hit, since
+most tests log in or register as setup. Every ROUTES endpoint is covered
+first, using the cheapest tests per newly covered route. The remaining budget
+goes to the tests most likely to fail per second of runtime. Tests without
+history are assumed to be average-length and risky.
+"""
+
+DEFAULT_DURATION = 1.0
+UNKNOWN_FAILURE_RATE = 0.5
+
+
+def per_test_stats(history: list) -> dict:
+    """Aggregate {nodeid: {'duration', 'failure_rate'}} over the history runs"""
+    runs = {}
+    for record in history:
+        for nodeid, test in record.get("tests", {}).items():
+            if test["outcome"] == "skipped":
+                continue
+            entry = runs.setdefault(nodeid, {"durations": [], "failures": 0})
+            entry["durations"].append(test["duration"] + test.get("setup", 0))
+            entry["failures"] += test["outcome"] == "failed"
+    return {
+        nodeid: {
+            "duration": statistics.median(entry["durations"]),
+            "failure_rate": entry["failures"] / len(entry["durations"]),
+        }
+        for nodeid, entry in runs.items()
+    }
+
+def select_within_budget(nodeids: list, history: list, budget: float) -> list:
+    """Return the nodeids to run, highest value first, within `budget` seconds (route coverage always wins)"""
+    known = per_test_stats(history)
+    default_duration = statistics.median([stats["duration"] for stats in known.values()]) if known else DEFAULT_DURATION
+    candidates = {}
+    for nodeid in nodeids:
+        stats = known.get(nodeid, {})
+        candidates[nodeid] = {
+            "duration": max(stats.get("duration", default_duration), 1e-3),
+            "failure_rate": stats.get("failure_rate", UNKNOWN_FAILURE_RATE),
+            "routes": set(module_routes(nodeid)) & set(ROUTES),
+        }
+
+    def value(nodeid):
+        candidate = candidates[nodeid]
+        return (candidate["failure_rate"] + 0.01) / candidate["duration"]
+
+    selected = []
+    spent = 0.0
+    uncovered = set().union(*(candidate["routes"] for candidate in candidates.values()))
+    while uncovered:
+        nodeid = max(
+            (nodeid for nodeid in candidates if nodeid not in selected and candidates[nodeid]["routes"] & uncovered),
+            key=lambda nodeid: (len(candidates[nodeid]["routes"] & uncovered) / candidates[nodeid]["duration"],
+                                value(nodeid)),
+        )
+        selected.append(nodeid)
+        spent += candidates[nodeid]["duration"]
+        uncovered -= candidates[nodeid]["routes"]
+
+    for nodeid in sorted(candidates, key=value, reverse=True):
+        if nodeid not in selected and spent + candidates[nodeid]["duration"] <= budget:
+            selected.append(nodeid)
+            spent += candidates[nodeid]["duration"]
+
+    return sorted(selected, key=value, reverse=True)
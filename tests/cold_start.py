@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import os
+import shlex
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from tests import data_factory
+from tests.instrumentation import InstrumentedTransport, MetricsRecorder
+from tests.json_codec import EncodedBody, json_request, response_json
+from tests.report_exporters import detail_export, export_results, parse_formats
+from tests.report_generator import DETAIL_MAX_ROWS, TestReportGenerator
+from tests.utils import DEFAULT_PASSWORD, ROUTES, auth_headers
+
+"""
+Cold-start measurement. Launches the service with a local command, measures
+time-to-ready, then sends a fixed sequence of requests one at a time so the
+first requests per endpoint (JWT key loading, Mongo pool creation, first
+bcrypt hash) can be compared with the steady state that follows:
+
+    python -m tests.cold_start --command "uvicorn app.main:app --port 8001" \\
+        --api-url http://localhost:8001 --first 10 --rounds 100
+
+Without --command the service is assumed to be running already, which only
+measures the client side of a cold start (new connections, empty caches).
+"""
+
+load_dotenv()
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+# Routes hit once per round, in this order; ending with delete_account leaves no users behind
+WARMUP_ROUTES = ("register_owner", "login", "verify_token", "profile", "update_profile", "delete_account")
+
+
+async def wait_until_ready(client, path: str = "/", timeout: float = 60.0,
+                           process: Optional[subprocess.Popen] = None, interval: float = 0.05) -> float:
+    """Poll `path` until the service answers with a non-5xx status, returning the seconds waited"""
+    started = time.perf_counter()
+    while True:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode} before becoming ready")
+        try:
+            response = await client.get(path)
+            if response.status_code < 500:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError(f"Service not ready after {timeout:g}s")
+        await asyncio.sleep(interval)
+
+async def warmup_round(client, factory) -> bool:
+    """One request per WARMUP_ROUTES entry, strictly one after the other, for a new user that the round deletes"""
+    spec = factory.user("coldstart")
+    user_data = {**spec, "password": DEFAULT_PASSWORD, "confirmPassword": DEFAULT_PASSWORD}
+    user_data.pop("user_type")
+    responses = [await client.post(ROUTES["register_owner"], **json_request(user_data))]
+    headers = None
+    try:
+        responses.append(await client.post(ROUTES["login"], **EncodedBody(
+            {"email": spec["email"], "password": DEFAULT_PASSWORD}).request()))
+        headers = auth_headers(response_json(responses[-1]).get("token", ""))
+        responses.append(await client.post(ROUTES["verify_token"], headers=headers))
+        responses.append(await client.get(ROUTES["profile"], headers=headers))
+        responses.append(await client.patch(ROUTES["update_profile"], **EncodedBody(
+            {"name": spec["name"], "phone": spec["phone"]}).request(headers)))
+        responses.append(await client.delete(ROUTES["delete_account"], headers=headers))
+        headers = None
+    finally:
+        if headers is not None:
+            # The round broke off before deleting its user
+            await client.delete(ROUTES["delete_account"], headers=headers)
+    return all(response.status_code in (200, 201) for response in responses)
+
+def warmup_summary(timeline: list, first: int) -> dict:
+    """Per route: first-request latency, mean of the first `first` requests and the steady state after them"""
+    sequences = {}
+    for _, route, seconds in timeline:
+        sequences.setdefault(route, []).append(seconds)
+    summary = {}
+    for route, sequence in sequences.items():
+        warmup = sequence[:first]
+        steady = sequence[first:] or warmup
+        steady_p50 = statistics.median(steady)
+        summary[route] = {
+            "first": sequence[0],
+            "warmup_mean": statistics.fmean(warmup),
+            "steady_p50": steady_p50,
+            "steady_p95": statistics.quantiles(steady, n=20)[-1] if len(steady) > 1 else steady[0],
+            "penalty": sequence[0] / steady_p50 if steady_p50 else 0.0,
+            "curve": sequence,
+        }
+    return summary
+
+async def measure_cold_start(api_url: str = API_URL, command: Optional[str] = None, ready_path: str = "/",
+                             ready_timeout: float = 60.0, rounds: int = 50, first: int = 10,
+                             timeout: float = 30.0) -> dict:
+    """Start the service (if `command` is given), wait until it is ready and time `rounds` request rounds"""
+    process = subprocess.Popen(shlex.split(command)) if command else None
+    recorder = MetricsRecorder(timeline=True)
+    transport = InstrumentedTransport(recorder, httpx.AsyncHTTPTransport())
+    factory = data_factory.default_factory()
+    try:
+        async with httpx.AsyncClient(base_url=api_url, timeout=timeout) as probe:
+            time_to_ready = await wait_until_ready(probe, ready_path, ready_timeout, process)
+
+        failures = 0
+        started = time.perf_counter()
+        async with httpx.AsyncClient(base_url=api_url, transport=transport, timeout=timeout) as client:
+            for _ in range(rounds):
+                try:
+                    ok = await warmup_round(client, factory)
+                except httpx.HTTPError:
+                    ok = False
+                failures += not ok
+        elapsed = time.perf_counter() - started
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return {
+        "command": command,
+        "time_to_ready": time_to_ready if command else None,
+        "rounds": rounds,
+        "first": first,
+        "failures": failures,
+        "elapsed": elapsed,
+        "routes": warmup_summary(recorder.timeline, first),
+        "latency": recorder.summary(elapsed),
+        "connections": recorder.connection_summary(),
+    }
+
+
+def build_report_results(result: dict) -> list:
+    test_results = []
+    if result["time_to_ready"] is not None:
+        test_results.append({
+            "name": f"cold_start_ready ({result['time_to_ready']:.2f} s)",
+            "outcome": "passed",
+            "duration": result["time_to_ready"],
+        })
+    test_results.append({
+        "name": f"cold_start_rounds ({result['rounds']} rondas, {result['failures']} fallidas)",
+        "outcome": "passed" if result["failures"] == 0 else "failed",
+        "duration": result["elapsed"],
+    })
+    return test_results
+
+def write_report(result: dict, prefix: str = "reporte_arranque_auth_BE", formats: tuple = ("pdf",)) -> list:
+    """Write the requested report formats, returning their paths"""
+    test_results = build_report_results(result)
+    cold_start = {
+        "time_to_ready": result["time_to_ready"],
+        "first": result["first"],
+        "routes": result["routes"],
+    }
+    os.makedirs("reports", exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    base_path = f"reports/{prefix}_{timestamp}"
+    if "pdf" in formats and len(test_results) > DETAIL_MAX_ROWS and "json" not in formats:
+        # The PDF only summarizes runs this large, so keep the full detail somewhere
+        formats = [*formats, "json"]
+    paths = export_results(test_results, base_path, formats, result["latency"],
+                           {"cold_start": cold_start, "connections": result["connections"]})
+    if "pdf" in formats:
+        TestReportGenerator(test_results, result["latency"], cold_start=cold_start,
+                            connection_metrics=result["connections"],
+                            export_path=detail_export(paths)).generate_report(f"{base_path}.pdf")
+        paths.insert(0, f"{base_path}.pdf")
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start and first-request latency of the auth service")
+    parser.add_argument("--command", help="Command that starts the service, e.g. 'uvicorn app.main:app'")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--ready-path", default="/", help="Path polled until the service answers")
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    parser.add_argument("--rounds", type=int, default=50, help=f"Request rounds over {', '.join(WARMUP_ROUTES)}")
+    parser.add_argument("--first", type=int, default=10, help="Requests per endpoint counted as warm-up")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--report-formats", type=parse_formats, default=["pdf"],
+                        help="Comma-separated report formats: pdf, json, junit, csv")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(measure_cold_start(args.api_url, args.command, args.ready_path, args.ready_timeout,
+                                            args.rounds, args.first, args.timeout))
+    paths = write_report(result, formats=args.report_formats)
+    if result["time_to_ready"] is not None:
+        print(f"ready after {result['time_to_ready']:.2f}s")
+    for route, stats in result["routes"].items():
+        print(f"{route:16} first {stats['first'] * 1000:8.1f} ms   steady p50 {stats['steady_p50'] * 1000:8.1f} ms   "
+              f"x{stats['penalty']:.1f}")
+    print(f"-> {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import hashlib
+import itertools
+import os
+import time
+from typing import Iterator, Optional
+
+"""
+Seeded, deterministic test data. Every value is derived arithmetically from a
+per-factory counter, so the same seed, namespace and worker always produce
+the same records and no two records of a factory collide. Emails embed the
+namespace and worker, so they never collide across runs or workers. Names,
+phones and addresses are taken from the worker's own stretch of the index
+space (a hash of the worker id), so two workers only share phones if their
+stretches overlap, about (users per worker) / 10**9.
+
+Environment:
+    TEST_DATA_SEED  seed for names, phones and addresses (default 0)
+    TEST_RUN_ID     namespace embedded in emails (default: the seed, if one
+                    is set, plus the start time)
+"""
+
+FIRST_NAMES = [
+    "Lucía", "Andrés", "Carlos", "Valentina", "Santiago", "Camila", "Mateo", "Daniela",
+    "Sebastián", "Mariana", "Juan", "Isabella", "Felipe", "Sofía", "Alejandro", "Gabriela",
+    "Nicolás", "Laura", "Diego", "Paula", "Samuel", "Natalia", "David", "Manuela",
+]
+LAST_NAMES = [
+    "Pérez", "Díaz", "Gómez", "Rodríguez", "Martínez", "López", "García", "Hernández",
+    "Ramírez", "Torres", "Sánchez", "Rojas", "Vargas", "Moreno", "Castro", "Jiménez",
+    "Ortiz", "Muñoz", "Suárez", "Romero", "Herrera", "Medina", "Aguilar", "Cárdenas",
+]
+CLINIC_NAMES = [
+    "Clínica Veterinaria", "Centro Veterinario", "Hospital Veterinario", "Consultorio Veterinario",
+]
+STREET_TYPES = ["Calle", "Carrera", "Avenida", "Diagonal", "Transversal"]
+LOCALITIES = [
+    "Usaquén", "Chapinero", "Santa Fe", "San Cristóbal", "Usme", "Tunjuelito", "Bosa",
+    "Kennedy", "Fontibón", "Engativá", "Suba", "Barrios Unidos", "Teusaquillo",
+    "Los Mártires", "Antonio Nariño", "Puente Aranda", "La Candelaria",
+    "Rafael Uribe Uribe", "Ciudad Bolívar", "Sumapaz",
+]
+
+_PHONE_SPACE = 10 ** 9
+_PHONE_STEP = 7_919_113  # coprime with 10**9, so (i * step + offset) % 10**9 is a permutation
+
+
+def _base36(number: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    encoded = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+        if not number:
+            return encoded
+
+
+class UserDataFactory:
+    """Generates unique, reproducible user data for one (seed, namespace, worker)."""
+
+    def __init__(self, seed: int = 0, namespace: str = "", worker: str = ""):
+        self.seed = seed
+        self.namespace = namespace
+        self.worker = worker
+        self._counter = itertools.count()
+        self._suffix = "".join(f"_{part}" for part in (namespace, worker) if part)
+        # Start of this worker's stretch of the phone/name/address index space
+        self._offset = int.from_bytes(hashlib.blake2b(worker.encode(), digest_size=8).digest(), "big") % _PHONE_SPACE
+
+    def email(self, prefix: str = "test", index: Optional[int] = None) -> str:
+        index = next(self._counter) if index is None else index
+        return f"{prefix}{self._suffix}_{index:x}@example.com"
+
+    def name(self, index: int, user_type: str = "owner") -> str:
+        index += self._offset + self.seed
+        if user_type == "clinic":
+            return f"{CLINIC_NAMES[index % len(CLINIC_NAMES)]} {LAST_NAMES[(index // 4) % len(LAST_NAMES)]}"
+        return f"{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[(index * 7 + 3) % len(LAST_NAMES)]}"
+
+    def phone(self, index: int) -> str:
+        """Colombian mobile number (57 3xx xxx xxxx), unique for the first 10**9 indexes"""
+        return f"573{((index + self._offset) * _PHONE_STEP + self.seed) % _PHONE_SPACE:09d}"
+
+    def address(self, index: int) -> str:
+        index += self._offset + self.seed
+        return (f"{STREET_TYPES[index % len(STREET_TYPES)]} {index % 180 + 1} "
+                f"# {(index * 13) % 99 + 1}-{(index * 31) % 99 + 1}")
+
+    def locality(self, index: int) -> str:
+        return LOCALITIES[(index + self._offset + self.seed) % len(LOCALITIES)]
+
+    def user(self, prefix: str = "test", user_type: str = "owner") -> dict:
+        """One register_test_user spec (email, name, phone, address, user_type and, for clinics, locality)"""
+        index = next(self._counter)
+        spec = {
+            "email": self.email(prefix, index),
+            "name": self.name(index, user_type),
+            "phone": self.phone(index),
+            "address": self.address(index),
+            "user_type": user_type,
+        }
+        if user_type == "clinic":
+            spec["locality"] = self.locality(index)
+        return spec
+
+    def users(self, count: Optional[int] = None, prefix: str = "test", user_type: str = "owner") -> Iterator[dict]:
+        """Lazily yield `count` user specs (endless if count is None)"""
+        indexes = itertools.count() if count is None else range(count)
+        for _ in indexes:
+            yield self.user(prefix, user_type)
+
+
+_default_factory = None
+
+def default_factory() -> UserDataFactory:
+    """Process-wide factory configured from TEST_DATA_SEED, TEST_RUN_ID and the pytest-xdist worker"""
+    if _default_factory is None:
+        configure()
+    return _default_factory
+
+def configure(seed: Optional[int] = None, namespace: Optional[str] = None, worker: Optional[str] = None) -> UserDataFactory:
+    """Replace the process-wide factory; give every concurrent process its own `worker` id"""
+    global _default_factory
+    env_seed = os.getenv("TEST_DATA_SEED")
+    if seed is None:
+        seed = int(env_seed) if env_seed else 0
+    if namespace is None:
+        # Seeded runs still get a fresh namespace, so re-running them cannot re-register the same emails
+        run_id = _base36(int(time.time() * 1000))
+        namespace = os.getenv("TEST_RUN_ID") or (f"s{seed}_{run_id}" if env_seed else run_id)
+    if worker is None:
+        worker = os.getenv("PYTEST_XDIST_WORKER", "")
+    _default_factory = UserDataFactory(seed, namespace, worker)
+    return _default_factory
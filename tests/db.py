@@ -0,0 +1,25 @@
+import os
+from dotenv import load_dotenv
+from pymongo.errors import ServerSelectionTimeoutError
+from motor.motor_asyncio import AsyncIOMotorClient
+
+"""
+Shared MongoDB connection settings for the harness. Every Motor client the
+harness opens identifies itself with APP_NAME so its own operations can be
+told apart from the service's.
+"""
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "petmatchDB_test")
+APP_NAME = "auth-service-tests"
+
+async def connect_mongo() -> AsyncIOMotorClient:
+    """Connect to MONGODB_URL, falling back to a local server if it is unreachable"""
+    try:
+        client = AsyncIOMotorClient(MONGODB_URL, serverSelectionTimeoutMS=2000, appname=APP_NAME)
+        await client.server_info()
+    except ServerSelectionTimeoutError:
+        client = AsyncIOMotorClient("mongodb://localhost:27017", appname=APP_NAME)
+    return client
@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import os
+from typing import Iterable, Optional
+
+from tests.db import MONGODB_DB_NAME, connect_mongo
+from tests.utils import token_claims
+
+"""
+Bulk integrity checks on the auth database, run after a scenario instead of
+per-document lookups. Every check is one aggregation pipeline per collection
+(chunked only for very long value lists), so they stay fast on collections
+with 100k+ users:
+
+    await assert_db_integrity(mongo_db, logged_out_tokens=[token], deleted_emails=[email])
+    python -m tests.db_assertions          # whole-database checks after a load run
+
+Field names follow the service's schema and can be overridden through the
+environment (USER_EMAIL_FIELD, REVOKED_TOKEN_FIELD) when it changes. The
+orphan check only covers the collections in USER_REFERENCES, which is empty
+unless set through the environment; the CLI also takes them as --reference.
+"""
+
+USER_EMAIL_FIELD = os.getenv("USER_EMAIL_FIELD", "email")
+# "token" stores the raw JWT; "jti" stores its jti claim
+REVOKED_TOKEN_FIELD = os.getenv("REVOKED_TOKEN_FIELD", "token")
+# {collection: field} of documents that belong to a user (_id), from e.g.
+# USER_REFERENCES="sessions:user_id,devices:owner". The auth service has no
+# such collection yet, so by default assert_db_integrity checks no orphans.
+# revoked_tokens is deliberately absent: delete_account revokes the token, so
+# its revocation must outlive the user.
+USER_REFERENCES = dict(reference.split(":", 1) for reference in os.getenv("USER_REFERENCES", "").split(",") if reference)
+
+# Keeps each $in list well below Mongo's 16 MB command limit
+CHUNK_SIZE = 10_000
+SAMPLE_SIZE = 20
+# Strength 2 compares letters and accents but not case
+CASE_INSENSITIVE = {"locale": "en", "strength": 2}
+
+
+def _chunks(values: list, size: int = CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def revocation_keys(tokens: Iterable[str], field: str = REVOKED_TOKEN_FIELD) -> list:
+    """The values revoked_tokens stores for `tokens` (the tokens themselves, or their jti claims)"""
+    if field == "jti":
+        return [token_claims(token).get("jti") for token in tokens]
+    return list(tokens)
+
+
+async def duplicate_emails(db, emails: Optional[list] = None, field: str = USER_EMAIL_FIELD,
+                           limit: int = SAMPLE_SIZE) -> list:
+    """Return [{'email', 'count'}] for emails held by more than one user (case-insensitive)"""
+    pipeline = [{"$match": {field: {"$in": emails}}}] if emails is not None else []
+    # The $in must ignore case like the grouping does, or it misses the variants of `emails`
+    options = {"collation": CASE_INSENSITIVE} if emails is not None else {}
+    pipeline += [
+        {"$group": {"_id": {"$toLower": f"${field}"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "email": "$_id", "count": 1}},
+    ]
+    return await db["users"].aggregate(pipeline, allowDiskUse=True, **options).to_list(None)
+
+async def missing_revocations(db, tokens: Iterable[str], field: str = REVOKED_TOKEN_FIELD) -> list:
+    """Return the logged-out tokens that have no revoked_tokens entry"""
+    tokens = list(tokens)
+    keys = revocation_keys(tokens, field)
+    found = set()
+    for chunk in _chunks(keys):
+        result = await db["revoked_tokens"].aggregate([
+            {"$match": {field: {"$in": chunk}}},
+            {"$group": {"_id": None, "keys": {"$addToSet": f"${field}"}}},
+        ]).to_list(None)
+        if result:
+            found.update(result[0]["keys"])
+    return [token for token, key in zip(tokens, keys) if key not in found]
+
+async def remaining_users(db, emails: Iterable[str], field: str = USER_EMAIL_FIELD) -> list:
+    """Return the deleted accounts' emails that still have a users document"""
+    remaining = []
+    for chunk in _chunks(list(emails)):
+        result = await db["users"].aggregate([
+            {"$match": {field: {"$in": chunk}}},
+            {"$group": {"_id": None, "emails": {"$addToSet": f"${field}"}}},
+        ]).to_list(None)
+        if result:
+            remaining.extend(result[0]["emails"])
+    return remaining
+
+async def orphaned_references(db, references: Optional[dict] = None, limit: int = SAMPLE_SIZE) -> dict:
+    """Return {collection: {'count', 'sample'}} for documents referencing a user that no longer exists"""
+    references = USER_REFERENCES if references is None else references
+    orphans = {}
+    for collection, field in references.items():
+        result = await db[collection].aggregate([
+            {"$lookup": {
+                "from": "users",
+                "let": {"user": f"${field}"},
+                "pipeline": [
+                    # User ids may be stored as strings next to ObjectId _ids
+                    {"$match": {"$expr": {"$eq": ["$_id", {
+                        "$convert": {"input": "$$user", "to": "objectId", "onError": "$$user", "onNull": None}
+                    }]}}},
+                    {"$limit": 1},
+                    {"$project": {"_id": 1}},
+                ],
+                "as": "owner",
+            }},
+            {"$match": {"owner": {"$size": 0}}},
+            {"$facet": {
+                "count": [{"$count": "value"}],
+                "sample": [{"$limit": limit}, {"$project": {"_id": 1, field: 1}}],
+            }},
+        ], allowDiskUse=True).to_list(None)
+        count = result[0]["count"][0]["value"] if result and result[0]["count"] else 0
+        if count:
+            orphans[collection] = {"count": count, "sample": result[0]["sample"]}
+    return orphans
+
+
+async def check_integrity(db, logged_out_tokens: Iterable[str] = (), deleted_emails: Iterable[str] = (),
+                          emails: Optional[list] = None, references: Optional[dict] = None) -> dict:
+    """Run every check, returning {check: findings} for the checks that found something.
+
+    `emails` limits the duplicate check to the scenario's users; by default the
+    whole users collection is checked.
+    """
+    findings = {
+        "duplicate_emails": await duplicate_emails(db, emails),
+        "missing_revocations": await missing_revocations(db, logged_out_tokens),
+        "remaining_users": await remaining_users(db, deleted_emails),
+        "orphaned_references": await orphaned_references(db, references),
+    }
+    return {check: found for check, found in findings.items() if found}
+
+async def assert_db_integrity(db, logged_out_tokens: Iterable[str] = (), deleted_emails: Iterable[str] = (),
+                              emails: Optional[list] = None, references: Optional[dict] = None):
+    findings = await check_integrity(db, logged_out_tokens, deleted_emails, emails, references)
+    assert not findings, "DB integrity checks failed: " + "; ".join(
+        f"{check}: {found!r}"[:500] for check, found in findings.items()
+    )
+
+
+async def _main_async(args) -> dict:
+    client = await connect_mongo()
+    try:
+        references = dict(reference.split(":", 1) for reference in args.reference) if args.reference else None
+        return await check_integrity(client[args.db], references=references)
+    finally:
+        client.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk integrity checks on the auth database")
+    parser.add_argument("--db", default=MONGODB_DB_NAME)
+    parser.add_argument("--reference", action="append",
+                        help="collection:field of documents that must reference an existing user (repeatable)")
+    args = parser.parse_args(argv)
+
+    findings = asyncio.run(_main_async(args))
+    for check, found in findings.items():
+        print(f"{check}: {found}")
+    if findings:
+        raise SystemExit(1)
+    print("No integrity problems found")
+
+
+if __name__ == "__main__":
+    main()
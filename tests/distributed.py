@@ -0,0 +1,307 @@
+import argparse
+import asyncio
+import functools
+import json
+import socket
+import struct
+import subprocess
+import sys
+from typing import Optional
+
+from tests.instrumentation import MetricsRecorder
+from tests.fault_injection import load_faults, merge_injected
+from tests.retry_policy import load_retry_policy, merge_retry_stats
+from tests.load_generator import API_URL, SCENARIOS, merge_window_seconds, merge_windows, run_load, write_report
+from tests.report_exporters import parse_formats
+from tests.report_history import HISTORY_RUNS
+from tests.workload import WorkloadProfile
+
+"""
+Distributed load generation. One coordinator hands scenario shards and
+user-pool slices to several worker nodes over plain TCP, collects their binary
+histogram snapshots and writes a single merged report. No external broker is
+needed, and `local` runs the whole topology on localhost:
+
+    python -m tests.distributed coordinator --port 5557 --nodes 2 --scenario mixed lifecycle_owner
+    python -m tests.distributed worker --coordinator 127.0.0.1:5557 --processes 4
+    python -m tests.distributed local --nodes 2 --processes 2 --scenario mixed
+"""
+
+HELLO = 1
+TASK = 2
+RESULT = 3
+
+_FRAME = struct.Struct("<BI")
+_META_LENGTH = struct.Struct("<I")
+
+
+async def send_frame(writer, kind: int, payload: bytes):
+    writer.write(_FRAME.pack(kind, len(payload)) + payload)
+    await writer.drain()
+
+async def read_frame(reader) -> tuple:
+    kind, length = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    return kind, await reader.readexactly(length)
+
+def encode_result(meta: dict, recorder: MetricsRecorder, windows: list = ()) -> bytes:
+    """Meta as JSON, then the recorder and any soak windows as concatenated binary snapshots"""
+    snapshots = [recorder.to_bytes()] + [window.to_bytes() for window in windows]
+    encoded = json.dumps({**meta, "snapshot_lengths": [len(snapshot) for snapshot in snapshots]}).encode()
+    return _META_LENGTH.pack(len(encoded)) + encoded + b"".join(snapshots)
+
+def decode_result(payload: bytes) -> tuple:
+    """Return (meta, recorder, windows)"""
+    (length,) = _META_LENGTH.unpack_from(payload)
+    start = _META_LENGTH.size
+    meta = json.loads(payload[start:start + length])
+    offset = start + length
+    recorders = []
+    for size in meta.pop("snapshot_lengths"):
+        recorders.append(MetricsRecorder.from_bytes(payload[offset:offset + size]))
+        offset += size
+    return meta, recorders[0], recorders[1:]
+
+
+def assign_shards(scenarios: list, nodes: int) -> list:
+    """Round-robin scenarios over nodes; nodes left without a shard repeat one so none sit idle"""
+    shards = [scenarios[index::nodes] for index in range(nodes)]
+    return [shard or [scenarios[index % len(scenarios)]] for index, shard in enumerate(shards)]
+
+def merge_node_results(node_results: list) -> dict:
+    recorder = MetricsRecorder()
+    windows = []
+    window_seconds = []
+    scenarios = {}
+    faults = {}
+    retries = {}
+    for meta, node_recorder, node_windows in node_results:
+        recorder.merge(node_recorder)
+        merge_windows(windows, node_windows)
+        merge_window_seconds(window_seconds, meta.get("window_seconds", []))
+        merge_injected(faults, meta.get("faults", {}))
+        merge_retry_stats(retries, meta.get("retries", {}))
+        for name, totals in meta["scenarios"].items():
+            merged = scenarios.setdefault(name, {"iterations": 0, "failures": 0, "timeouts": 0, "workers": 0,
+                                                 "elapsed": 0.0})
+            merged["iterations"] += totals["iterations"]
+            merged["failures"] += totals["failures"]
+            merged["timeouts"] += totals.get("timeouts", 0)
+            merged["workers"] += totals["workers"]
+            merged["elapsed"] = max(merged["elapsed"], totals["elapsed"])
+    return {
+        "recorder": recorder,
+        "windows": windows,
+        "window_seconds": window_seconds,
+        "scenarios": scenarios,
+        "elapsed": max((meta["elapsed"] for meta, _, _ in node_results), default=0.0),
+        "iterations": sum(meta["iterations"] for meta, _, _ in node_results),
+        "failures": sum(meta["failures"] for meta, _, _ in node_results),
+        "timeouts": sum(meta.get("timeouts", 0) for meta, _, _ in node_results),
+        "faults": faults,
+        "retries": retries,
+        "workers": sum(meta["workers"] for meta, _, _ in node_results),
+        "nodes": [meta["node"] for meta, _, _ in node_results],
+    }
+
+
+class Coordinator:
+    """Accepts worker nodes, hands out shards and merges what they send back."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._connections = asyncio.Queue()
+
+    async def start(self):
+        async def on_connect(reader, writer):
+            await self._connections.put((reader, writer))
+
+        self._server = await asyncio.start_server(on_connect, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def run(self, nodes: int, scenarios: list, users: int, concurrency: int, duration: float,
+                  api_url: str = API_URL, timeout: float = 10.0, connect_timeout: float = 60.0,
+                  workload: Optional[WorkloadProfile] = None, window: float = 0.0,
+                  measure_decode: bool = False, faults: Optional[dict] = None,
+                  retry_policy: Optional[dict] = None) -> dict:
+        connections = []
+        try:
+            for _ in range(nodes):
+                reader, writer = await asyncio.wait_for(self._connections.get(), connect_timeout)
+                kind, payload = await read_frame(reader)
+                if kind != HELLO:
+                    raise ConnectionError(f"Expected HELLO from worker node, got frame type {kind}")
+                connections.append((reader, writer, json.loads(payload)))
+
+            share, remainder = divmod(users, nodes)
+            for index, (shard, (_, writer, _)) in enumerate(zip(assign_shards(list(scenarios), nodes), connections)):
+                task = {
+                    "scenarios": shard,
+                    "users": max(1, share + (1 if index < remainder else 0)),
+                    "user_prefix": f"load_n{index}",
+                    "concurrency": concurrency,
+                    "duration": duration,
+                    "window": window,
+                    "measure_decode": measure_decode,
+                    "workload": (workload or WorkloadProfile()).to_dict(),
+                    "faults": faults or {},
+                    "retry_policy": retry_policy or {},
+                    "api_url": api_url,
+                    "timeout": timeout,
+                }
+                await send_frame(writer, TASK, json.dumps(task).encode())
+
+            async def collect(reader):
+                kind, payload = await read_frame(reader)
+                if kind != RESULT:
+                    raise ConnectionError(f"Expected RESULT from worker node, got frame type {kind}")
+                return decode_result(payload)
+
+            node_results = await asyncio.gather(*(collect(reader) for reader, _, _ in connections))
+        finally:
+            for _, writer, _ in connections:
+                writer.close()
+
+        return merge_node_results(node_results)
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+async def serve_node(host: str, port: int, processes: int, name: str = None, connect_timeout: float = 60.0):
+    """Connect to a coordinator, run the assigned shard with a local process pool and report back"""
+    name = name or socket.gethostname()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + connect_timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            break
+        except OSError:
+            if loop.time() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+    try:
+        await send_frame(writer, HELLO, json.dumps({"node": name, "processes": processes}).encode())
+        kind, payload = await read_frame(reader)
+        if kind != TASK:
+            raise ConnectionError(f"Expected TASK from coordinator, got frame type {kind}")
+        task = json.loads(payload)
+
+        result = await loop.run_in_executor(None, functools.partial(
+            run_load,
+            processes=processes,
+            users=task["users"],
+            concurrency=task["concurrency"],
+            duration=task["duration"],
+            scenarios=tuple(task["scenarios"]),
+            api_url=task["api_url"],
+            timeout=task["timeout"],
+            user_prefix=task["user_prefix"],
+            workload=WorkloadProfile.from_dict(task["workload"]),
+            window=task["window"],
+            measure_decode=task["measure_decode"],
+            faults=task.get("faults"),
+            retry_policy=task.get("retry_policy"),
+        ))
+        meta = {key: result[key] for key in ("scenarios", "elapsed", "iterations", "failures", "timeouts", "faults",
+                                             "retries", "workers", "window_seconds")}
+        meta["node"] = name
+        await send_frame(writer, RESULT, encode_result(meta, result["recorder"], result["windows"]))
+    finally:
+        writer.close()
+
+
+async def run_local(nodes: int, processes: int, scenarios: list, users: int, concurrency: int, duration: float,
+                    api_url: str = API_URL, timeout: float = 10.0, workload: Optional[WorkloadProfile] = None,
+                    window: float = 0.0, measure_decode: bool = False, faults: Optional[dict] = None,
+                    retry_policy: Optional[dict] = None) -> dict:
+    """Run a coordinator and `nodes` worker subprocesses on localhost"""
+    coordinator = Coordinator("127.0.0.1", 0)
+    await coordinator.start()
+    workers = [subprocess.Popen([
+        sys.executable, "-m", "tests.distributed", "worker",
+        "--coordinator", f"127.0.0.1:{coordinator.port}",
+        "--processes", str(processes),
+        "--name", f"local-{index}",
+    ]) for index in range(nodes)]
+    try:
+        return await coordinator.run(nodes, scenarios, users, concurrency, duration, api_url, timeout,
+                                     workload=workload, window=window, measure_decode=measure_decode,
+                                     faults=faults, retry_policy=retry_policy)
+    finally:
+        await coordinator.close()
+        for worker in workers:
+            worker.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed load generation for the auth service")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for command in ("coordinator", "local"):
+        sub = commands.add_parser(command)
+        sub.add_argument("--nodes", type=int, default=2)
+        sub.add_argument("--users", type=int, default=100, help="Total users, sliced across nodes")
+        sub.add_argument("--concurrency", type=int, default=50, help="Virtual users per process")
+        sub.add_argument("--duration", type=float, default=30.0)
+        sub.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=["mixed"])
+        sub.add_argument("--timeout", type=float, default=10.0)
+        sub.add_argument("--api-url", default=API_URL)
+        sub.add_argument("--workload", help="JSON workload profile sent to every node")
+        sub.add_argument("--soak-window", type=float, default=0.0)
+        sub.add_argument("--measure-decode", action="store_true")
+        sub.add_argument("--faults", help="JSON fault profile sent to every node")
+        sub.add_argument("--retry-policy", help="JSON per-route timeout/retry policy sent to every node")
+        sub.add_argument("--report-formats", type=parse_formats, default=["pdf"])
+        sub.add_argument("--history-runs", type=int, default=HISTORY_RUNS,
+                         help="Runs from reports/history.jsonl to chart as trends (0 disables the history)")
+    commands.choices["coordinator"].add_argument("--host", default="127.0.0.1")
+    commands.choices["coordinator"].add_argument("--port", type=int, default=5557)
+    commands.choices["local"].add_argument("--processes", type=int, default=1, help="Processes per node")
+
+    worker = commands.add_parser("worker")
+    worker.add_argument("--coordinator", default="127.0.0.1:5557", help="host:port of the coordinator")
+    worker.add_argument("--processes", type=int, default=1)
+    worker.add_argument("--name")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        host, port = args.coordinator.rsplit(":", 1)
+        asyncio.run(serve_node(host, int(port), args.processes, args.name))
+        return
+
+    workload = WorkloadProfile.load(args.workload) if args.workload else None
+    faults = load_faults(args.faults)
+    retry_policy = load_retry_policy(args.retry_policy) if args.retry_policy else None
+    if args.command == "local":
+        result = asyncio.run(run_local(args.nodes, args.processes, args.scenario, args.users,
+                                       args.concurrency, args.duration, args.api_url, args.timeout,
+                                       workload, args.soak_window, args.measure_decode, faults, retry_policy))
+    else:
+        async def coordinate():
+            coordinator = Coordinator(args.host, args.port)
+            await coordinator.start()
+            try:
+                return await coordinator.run(args.nodes, args.scenario, args.users, args.concurrency,
+                                             args.duration, args.api_url, args.timeout,
+                                             workload=workload, window=args.soak_window,
+                                             measure_decode=args.measure_decode, faults=faults,
+                                             retry_policy=retry_policy)
+            finally:
+                await coordinator.close()
+
+        result = asyncio.run(coordinate())
+
+    paths = write_report(result, prefix="reporte_distribuido_auth_BE", window=args.soak_window,
+                         formats=args.report_formats, faults=faults, history_runs=args.history_runs)
+    print(f"{len(result['nodes'])} nodes, {result['iterations']} iterations, "
+          f"{result['failures']} failures in {result['elapsed']:.2f}s -> {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    main()
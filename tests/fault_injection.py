@@ -0,0 +1,124 @@
+import asyncio
+import json
+import random
+from typing import Optional
+
+import httpx
+
+from tests import json_codec
+from tests.instrumentation import INJECTED_DELAY
+from tests.utils import route_config, route_key
+
+"""
+Client-side fault injection. FaultInjectingTransport sits between the
+instrumented transport and the network and, per ROUTES entry, adds latency
+and jitter, drops connections and answers with 5xx errors, so timeouts,
+retries and throughput of the scenarios can be measured against a slow or
+flaky service without touching it. Faults are configured per route (see
+utils.route_config):
+
+    {"*": {"latency_ms": 50, "jitter_ms": 20}, "login": {"error_rate": 0.1, "drop_rate": 0.02}}
+"""
+
+FAULT_FIELDS = ("latency_ms", "jitter_ms", "drop_rate", "error_rate", "error_status")
+INJECTED_FIELDS = ("requests", "delayed", "delay_seconds", "timeouts", "dropped", "errors")
+DEFAULT_ERROR_STATUS = 503
+
+_ERROR_BODY = json_codec.dumps({"detail": "Injected fault"})
+
+
+def load_faults(path: Optional[str] = None) -> dict:
+    """Read a JSON fault profile, validating its field names"""
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as handle:
+        faults = json.load(handle)
+    for route, fault in faults.items():
+        unknown = set(fault) - set(FAULT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fault fields {sorted(unknown)} for {route!r}, expected any of {FAULT_FIELDS}")
+    return faults
+
+def merge_injected(merged: dict, other: dict):
+    """Add one transport's {route: injected counts} into `merged`"""
+    for route, counts in other.items():
+        totals = merged.setdefault(route, dict.fromkeys(INJECTED_FIELDS, 0))
+        for field in INJECTED_FIELDS:
+            totals[field] += counts[field]
+
+def fault_summary(faults: dict, injected: dict) -> dict:
+    """Return {route: configured faults plus injected counts} for the report"""
+    summary = {}
+    for route in sorted(injected):
+        counts = injected[route]
+        fault = route_config(faults, route)
+        summary[route] = {
+            "latency_ms": fault.get("latency_ms", 0),
+            "jitter_ms": fault.get("jitter_ms", 0),
+            "drop_rate": fault.get("drop_rate", 0.0),
+            "error_rate": fault.get("error_rate", 0.0),
+            **{field: counts[field] for field in INJECTED_FIELDS if field != "delay_seconds"},
+            "mean_delay_ms": counts["delay_seconds"] / counts["delayed"] * 1000 if counts["delayed"] else 0.0,
+        }
+    return summary
+
+
+class FaultInjectingTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport and injects the configured faults before requests reach it.
+
+    Injected latency longer than the request's read timeout ends in
+    httpx.ReadTimeout after the timeout, as a slow server would. Dropped
+    connections raise httpx.RemoteProtocolError and errors are answered
+    locally without reaching the service. Pass a shared `injected` dict to
+    count across several transports (e.g. one client per test).
+    """
+
+    def __init__(self, faults: dict, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 seed: Optional[int] = None, injected: Optional[dict] = None):
+        self.faults = faults
+        self.injected = {} if injected is None else injected
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._random = random.Random(seed)
+
+    async def handle_async_request(self, request):
+        route = route_key(request.method, request.url.path)
+        fault = route_config(self.faults, route)
+        if not fault:
+            return await self._transport.handle_async_request(request)
+
+        counts = self.injected.get(route)
+        if counts is None:
+            counts = self.injected[route] = dict.fromkeys(INJECTED_FIELDS, 0)
+        counts["requests"] += 1
+
+        jitter = fault.get("jitter_ms", 0)
+        delay = max(0.0, fault.get("latency_ms", 0) + self._random.uniform(-jitter, jitter)) / 1000
+        if delay:
+            timeout = request.extensions.get("timeout", {}).get("read")
+            if timeout is not None and delay >= timeout:
+                await asyncio.sleep(timeout)
+                counts["timeouts"] += 1
+                raise httpx.ReadTimeout("Injected latency exceeded the read timeout", request=request)
+            await asyncio.sleep(delay)
+            # Tells an outer InstrumentedTransport not to count the delay as pool wait
+            request.extensions[INJECTED_DELAY] = delay
+            counts["delayed"] += 1
+            counts["delay_seconds"] += delay
+
+        roll = self._random.random()
+        drop_rate = fault.get("drop_rate", 0.0)
+        if roll < drop_rate:
+            counts["dropped"] += 1
+            raise httpx.RemoteProtocolError("Server disconnected without sending a response (injected)",
+                                            request=request)
+        if roll < drop_rate + fault.get("error_rate", 0.0):
+            counts["errors"] += 1
+            # A stream (not content=) so the body is read through the outer transports like a real response
+            return httpx.Response(fault.get("error_status", DEFAULT_ERROR_STATUS),
+                                  headers={**json_codec.JSON_HEADERS, "Content-Length": str(len(_ERROR_BODY))},
+                                  stream=httpx.ByteStream(_ERROR_BODY), request=request)
+
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,72 @@
+"""
+Index health for the auth collections. Checks that the indexes the auth
+queries depend on exist and recommends new ones for query shapes (as seen by
+the Mongo profiler) that no existing index can serve.
+"""
+
+REVOKED_TOKEN_LOOKUP_FIELDS = ("token", "jti")
+
+
+async def fetch_indexes(db, collections=("users", "revoked_tokens")) -> dict:
+    """Return {collection: [{'name', 'keys', 'unique', 'ttl'}]}"""
+    indexes = {}
+    for name in collections:
+        information = await db[name].index_information()
+        indexes[name] = [{
+            "name": index_name,
+            "keys": [field for field, _ in spec["key"]],
+            "unique": bool(spec.get("unique")),
+            "ttl": spec.get("expireAfterSeconds"),
+        } for index_name, spec in information.items()]
+    return indexes
+
+def _find(indexes: list, predicate):
+    return next((index for index in indexes if predicate(index)), None)
+
+def unique_email_index(indexes: dict):
+    return _find(indexes.get("users", []), lambda index: index["keys"][:1] == ["email"] and index["unique"])
+
+def token_lookup_index(indexes: dict):
+    return _find(indexes.get("revoked_tokens", []),
+                 lambda index: index["keys"][0] in REVOKED_TOKEN_LOOKUP_FIELDS)
+
+def revoked_token_ttl_index(indexes: dict):
+    return _find(indexes.get("revoked_tokens", []), lambda index: index["ttl"] is not None)
+
+def check_indexes(indexes: dict) -> list:
+    """Evaluate the required auth indexes, returning one row per check"""
+    checks = [
+        ("users", "Índice único en email", unique_email_index(indexes)),
+        ("revoked_tokens", "Índice de búsqueda por token/jti", token_lookup_index(indexes)),
+        ("revoked_tokens", "Índice TTL de expiración", revoked_token_ttl_index(indexes)),
+    ]
+    return [{
+        "collection": collection,
+        "check": check,
+        "ok": index is not None,
+        "index": index["name"] if index else None,
+    } for collection, check, index in checks]
+
+def recommend_indexes(indexes: dict, query_shapes: dict) -> list:
+    """Recommend an index for each observed {(collection, shape): count} whose fields lead no existing index"""
+    recommendations = []
+    for (collection, shape), count in sorted(query_shapes.items(), key=lambda item: -item[1]):
+        if not shape:
+            continue
+        existing = indexes.get(collection, [])
+        if any(index["keys"][0] in shape for index in existing):
+            continue
+        recommendations.append({
+            "collection": collection,
+            "shape": shape,
+            "count": count,
+            "recommended": {field: 1 for field in shape},
+        })
+    return recommendations
+
+async def build_index_report(db, query_shapes: dict) -> dict:
+    indexes = await fetch_indexes(db)
+    return {
+        "checks": check_indexes(indexes),
+        "recommendations": recommend_indexes(indexes, query_shapes),
+    }
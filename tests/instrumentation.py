@@ -0,0 +1,482 @@
+import json
+import math
+import statistics
+import struct
+import time
+import zlib
+from typing import Optional
+
+import httpx
+
+from tests import json_codec
+from tests.utils import route_config, route_key
+
+"""
+Client-side request instrumentation. Latencies are kept in log-bucketed
+histograms so results from several processes can be merged without keeping
+every sample around. Response body and header sizes and the time the harness
+spends decoding JSON bodies (json_codec.response_json) are tracked per route
+as well, checked against PAYLOAD_BUDGETS and against a baseline taken from
+earlier runs in the history.
+Connection reuse (new vs. reused connections, connect time and time spent
+waiting for a pool slot) comes from httpcore's `trace` request extension.
+"""
+
+_GROWTH = 1.02
+_LOG_GROWTH = math.log(_GROWTH)
+
+_HISTOGRAM_HEADER = struct.Struct("<QdddI")
+_BUCKET = struct.Struct("<iQ")
+_ROUTE_HEADER = struct.Struct("<HIQ")
+_STATUS = struct.Struct("<HQ")
+_PAYLOAD = struct.Struct("<QQQQQdd")
+_CONNECTION = struct.Struct("<QQdddd")
+
+# Request extension: seconds a wrapped transport (FaultInjectingTransport) held the request back on purpose
+INJECTED_DELAY = "injected_delay"
+
+PAYLOAD_FIELDS = ("responses", "body_bytes", "max_body_bytes", "header_bytes", "decodes",
+                  "decode_seconds", "max_decode_seconds")
+CONNECTION_FIELDS = ("new", "reused", "connect_seconds", "max_connect_seconds", "pool_wait_seconds",
+                     "max_pool_wait_seconds")
+
+# "*" applies to every route; route keys (see utils.route_key) override it
+PAYLOAD_BUDGETS = {
+    "*": {"body_bytes": 4096, "decode_ms": 1.0},
+    "login": {"body_bytes": 2048},
+    "verify_token": {"body_bytes": 512},
+}
+# Growth over the baseline (per-route median of earlier runs) tolerated before a route counts as regressed
+PAYLOAD_REGRESSION_TOLERANCE = {"max_body_bytes": 0.10, "decode_ms": 0.50}
+
+
+class LatencyHistogram:
+    """Sparse log-bucketed histogram of latencies (~2% relative error)."""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds: float):
+        micros = max(seconds * 1e6, 1.0)
+        index = int(math.log(micros) / _LOG_GROWTH)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def percentile(self, pct: float) -> float:
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * pct / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                upper = _GROWTH ** (index + 1) / 1e6
+                return min(upper, self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_bytes(self) -> bytes:
+        """Compact binary snapshot: fixed header followed by (bucket, count) pairs"""
+        header = _HISTOGRAM_HEADER.pack(
+            self.count, self.total,
+            -1.0 if self.min is None else self.min,
+            -1.0 if self.max is None else self.max,
+            len(self.counts),
+        )
+        return header + b"".join(_BUCKET.pack(index, count) for index, count in self.counts.items())
+
+    @classmethod
+    def from_bytes(cls, data: bytes, offset: int = 0) -> "LatencyHistogram":
+        histogram, _ = cls._unpack(data, offset)
+        return histogram
+
+    @classmethod
+    def _unpack(cls, data: bytes, offset: int) -> tuple:
+        histogram = cls()
+        histogram.count, histogram.total, low, high, buckets = _HISTOGRAM_HEADER.unpack_from(data, offset)
+        histogram.min = None if low < 0 else low
+        histogram.max = None if high < 0 else high
+        offset += _HISTOGRAM_HEADER.size
+        for _ in range(buckets):
+            index, count = _BUCKET.unpack_from(data, offset)
+            histogram.counts[index] = count
+            offset += _BUCKET.size
+        return histogram, offset
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max or 0.0,
+        }
+
+
+class MetricsRecorder:
+    """Per-route latency histograms plus status and error counters.
+
+    With `timeline=True` every request is also kept as (timestamp, route, seconds)
+    so latency can be plotted over time; leave it off for load runs. While
+    `context` is set (e.g. to the running test's nodeid), its requests are
+    also counted and timed per endpoint in `context_requests`.
+    """
+
+    def __init__(self, timeline: bool = False):
+        self.histograms = {}
+        self.status_counts = {}
+        self.errors = {}
+        self.payloads = {}
+        self.connections = {}
+        self.timeline = [] if timeline else None
+        self.context = None
+        self.context_requests = {}
+
+    def record(self, route: str, seconds: float, status_code: Optional[int], endpoint: Optional[str] = None):
+        """Record one request's latency and status under `route`; `endpoint` (default: `route`) keys its context count"""
+        if self.timeline is not None:
+            self.timeline.append((time.time(), route, seconds))
+        if self.context is not None:
+            cell = self.context_requests.setdefault(self.context, {}).setdefault(endpoint or route, [0, 0.0])
+            cell[0] += 1
+            cell[1] += seconds
+        self.histograms.setdefault(route, LatencyHistogram()).record(seconds)
+        statuses = self.status_counts.setdefault(route, {})
+        statuses[status_code] = statuses.get(status_code, 0) + 1
+        if status_code is None or status_code >= 500:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def _payload(self, route: str) -> dict:
+        payload = self.payloads.get(route)
+        if payload is None:
+            payload = self.payloads[route] = dict.fromkeys(PAYLOAD_FIELDS, 0)
+        return payload
+
+    def record_payload(self, route: str, body_bytes: int, header_bytes: int):
+        """Record one response's body and header size"""
+        payload = self._payload(route)
+        payload["responses"] += 1
+        payload["body_bytes"] += body_bytes
+        payload["max_body_bytes"] = max(payload["max_body_bytes"], body_bytes)
+        payload["header_bytes"] += header_bytes
+
+    def record_decode(self, route: str, seconds: float):
+        """Record the time one response_json call spent decoding a body"""
+        payload = self._payload(route)
+        payload["decodes"] += 1
+        payload["decode_seconds"] += seconds
+        payload["max_decode_seconds"] = max(payload["max_decode_seconds"], seconds)
+
+    def record_connection(self, route: str, reused: bool, connect_seconds: float, pool_wait_seconds: float):
+        """Record whether a request got a new or a reused connection, and how long connecting and waiting took"""
+        connection = self.connections.get(route)
+        if connection is None:
+            connection = self.connections[route] = dict.fromkeys(CONNECTION_FIELDS, 0)
+        if reused:
+            connection["reused"] += 1
+        else:
+            connection["new"] += 1
+            connection["connect_seconds"] += connect_seconds
+            connection["max_connect_seconds"] = max(connection["max_connect_seconds"], connect_seconds)
+        connection["pool_wait_seconds"] += pool_wait_seconds
+        connection["max_pool_wait_seconds"] = max(connection["max_pool_wait_seconds"], pool_wait_seconds)
+
+    @staticmethod
+    def _merge_counters(merged: dict, other: dict, fields: tuple):
+        for field in fields:
+            if field.startswith("max_"):
+                merged[field] = max(merged[field], other[field])
+            else:
+                merged[field] += other[field]
+
+    def _merge_payload(self, route: str, other: dict):
+        self._merge_counters(self.payloads.setdefault(route, dict.fromkeys(PAYLOAD_FIELDS, 0)), other, PAYLOAD_FIELDS)
+
+    def _merge_connection(self, route: str, other: dict):
+        self._merge_counters(self.connections.setdefault(route, dict.fromkeys(CONNECTION_FIELDS, 0)), other,
+                             CONNECTION_FIELDS)
+
+    def merge(self, other: "MetricsRecorder"):
+        for route, histogram in other.histograms.items():
+            self.histograms.setdefault(route, LatencyHistogram()).merge(histogram)
+        for route, statuses in other.status_counts.items():
+            merged = self.status_counts.setdefault(route, {})
+            for status_code, count in statuses.items():
+                merged[status_code] = merged.get(status_code, 0) + count
+        for route, count in other.errors.items():
+            self.errors[route] = self.errors.get(route, 0) + count
+        for route, payload in other.payloads.items():
+            self._merge_payload(route, payload)
+        for route, connection in other.connections.items():
+            self._merge_connection(route, connection)
+
+    def to_bytes(self) -> bytes:
+        """zlib-compressed binary snapshot of every route, for shipping between nodes"""
+        parts = []
+        for route, histogram in self.histograms.items():
+            name = route.encode()
+            statuses = self.status_counts.get(route, {})
+            parts.append(_ROUTE_HEADER.pack(len(name), len(statuses), self.errors.get(route, 0)))
+            parts.append(name)
+            parts.extend(_STATUS.pack(status_code or 0, count) for status_code, count in statuses.items())
+            parts.append(histogram.to_bytes())
+            payload = self.payloads.get(route) or dict.fromkeys(PAYLOAD_FIELDS, 0)
+            parts.append(_PAYLOAD.pack(*(payload[field] for field in PAYLOAD_FIELDS)))
+            connection = self.connections.get(route) or dict.fromkeys(CONNECTION_FIELDS, 0)
+            parts.append(_CONNECTION.pack(*(connection[field] for field in CONNECTION_FIELDS)))
+        return zlib.compress(b"".join(parts))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MetricsRecorder":
+        recorder = cls()
+        data = zlib.decompress(data)
+        offset = 0
+        while offset < len(data):
+            name_length, status_entries, errors = _ROUTE_HEADER.unpack_from(data, offset)
+            offset += _ROUTE_HEADER.size
+            route = data[offset:offset + name_length].decode()
+            offset += name_length
+            statuses = recorder.status_counts.setdefault(route, {})
+            for _ in range(status_entries):
+                status_code, count = _STATUS.unpack_from(data, offset)
+                statuses[status_code or None] = count
+                offset += _STATUS.size
+            recorder.histograms[route], offset = LatencyHistogram._unpack(data, offset)
+            payload = dict(zip(PAYLOAD_FIELDS, _PAYLOAD.unpack_from(data, offset)))
+            offset += _PAYLOAD.size
+            if payload["responses"] or payload["decodes"]:
+                recorder.payloads[route] = payload
+            connection = dict(zip(CONNECTION_FIELDS, _CONNECTION.unpack_from(data, offset)))
+            offset += _CONNECTION.size
+            if connection["new"] or connection["reused"]:
+                recorder.connections[route] = connection
+            if errors:
+                recorder.errors[route] = errors
+        return recorder
+
+    def summary(self, elapsed: Optional[float] = None) -> dict:
+        """Return {route: stats} ready for TestReportGenerator's latency table"""
+        metrics = {}
+        for route in sorted(self.histograms):
+            stats = self.histograms[route].summary()
+            stats["errors"] = self.errors.get(route, 0)
+            if elapsed:
+                stats["rps"] = stats["count"] / elapsed
+            metrics[route] = stats
+        return metrics
+
+    def payload_summary(self) -> dict:
+        """Return {route: mean/max body bytes, mean header bytes and JSON decode ms}.
+
+        Decode times are None for routes whose responses nobody decoded.
+        """
+        metrics = {}
+        for route in sorted(self.payloads):
+            payload = self.payloads[route]
+            metrics[route] = {
+                "responses": payload["responses"],
+                "body_bytes": payload["body_bytes"] / payload["responses"] if payload["responses"] else 0.0,
+                "max_body_bytes": payload["max_body_bytes"],
+                "header_bytes": payload["header_bytes"] / payload["responses"] if payload["responses"] else 0.0,
+                "decode_ms": payload["decode_seconds"] / payload["decodes"] * 1000 if payload["decodes"] else None,
+                "max_decode_ms": payload["max_decode_seconds"] * 1000 if payload["decodes"] else None,
+            }
+        return metrics
+
+    def connection_summary(self) -> dict:
+        """Return {route: new/reused connections, reuse rate, mean/max connect ms and pool wait ms}"""
+        metrics = {}
+        for route in sorted(self.connections):
+            connection = self.connections[route]
+            requests = connection["new"] + connection["reused"]
+            metrics[route] = {
+                "requests": requests,
+                "new": connection["new"],
+                "reused": connection["reused"],
+                "reuse_rate": connection["reused"] / requests if requests else 0.0,
+                "connect_ms": connection["connect_seconds"] / connection["new"] * 1000 if connection["new"] else 0.0,
+                "max_connect_ms": connection["max_connect_seconds"] * 1000,
+                "pool_wait_ms": connection["pool_wait_seconds"] / requests * 1000 if requests else 0.0,
+                "max_pool_wait_ms": connection["max_pool_wait_seconds"] * 1000,
+            }
+        return metrics
+
+
+def load_payload_budgets(path: Optional[str] = None) -> dict:
+    """PAYLOAD_BUDGETS, with the per-route entries of a JSON budgets file laid over it"""
+    if not path:
+        return PAYLOAD_BUDGETS
+    with open(path, encoding="utf-8") as handle:
+        return {**PAYLOAD_BUDGETS, **json.load(handle)}
+
+def check_payload_budgets(payload_metrics: dict, budgets: Optional[dict] = None) -> dict:
+    """Return {route: [exceeded budget names]} for routes whose max body or mean decode time is over budget"""
+    budgets = PAYLOAD_BUDGETS if budgets is None else budgets
+    violations = {}
+    for route, stats in payload_metrics.items():
+        budget = route_config(budgets, route)
+        exceeded = []
+        if "body_bytes" in budget and stats["max_body_bytes"] > budget["body_bytes"]:
+            exceeded.append("body_bytes")
+        if "decode_ms" in budget and stats["decode_ms"] is not None and stats["decode_ms"] > budget["decode_ms"]:
+            exceeded.append("decode_ms")
+        if exceeded:
+            violations[route] = exceeded
+    return violations
+
+def payload_baseline(history: list) -> dict:
+    """Per-route median max body bytes and mean decode ms over the runs in `history` that stored them"""
+    values = {}
+    for run in history:
+        for route, stats in run.get("payload", {}).items():
+            for field, value in stats.items():
+                if value:
+                    values.setdefault(route, {}).setdefault(field, []).append(value)
+    return {route: {field: statistics.median(samples) for field, samples in fields.items()}
+            for route, fields in values.items()}
+
+def check_payload_regressions(payload_metrics: dict, baseline: dict, tolerance: Optional[dict] = None) -> dict:
+    """Return {route: [regressed fields]} for routes that grew more than `tolerance` over their baseline"""
+    tolerance = PAYLOAD_REGRESSION_TOLERANCE if tolerance is None else tolerance
+    regressions = {}
+    for route, stats in payload_metrics.items():
+        reference = baseline.get(route, {})
+        regressed = [field for field, allowed in tolerance.items()
+                     if reference.get(field) and (stats.get(field) or 0) > reference[field] * (1 + allowed)]
+        if regressed:
+            regressions[route] = regressed
+    return regressions
+
+def header_size(response) -> int:
+    """Approximate on-the-wire size of the response status line and headers"""
+    return len(response.extensions.get("reason_phrase", b"")) + 15 + sum(
+        len(name) + len(value) + 4 for name, value in response.headers.raw
+    )
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """Passes the body through, counting its bytes."""
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self.body_bytes = 0
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self.body_bytes += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+        if self._on_close is not None:
+            on_close, self._on_close = self._on_close, None
+            on_close(self)
+
+
+class _ConnectionTrace:
+    """httpcore `trace` callback noting whether a request opened a connection and when it got one.
+
+    A request has a connection from its first connect or send-headers event
+    on; everything before that, less any INJECTED_DELAY, is time spent waiting
+    for a pool slot.
+    """
+
+    def __init__(self, started: float, chained=None):
+        self.started = started
+        self.acquired = None
+        self.reused = True
+        self.connect_seconds = 0.0
+        self._step_started = None
+        self._chained = chained
+
+    async def __call__(self, event: str, info: dict):
+        now = time.perf_counter()
+        if self.acquired is None and (event.startswith("connection.") or ".send_request_headers." in event
+                                      or ".send_connection_init." in event):
+            self.acquired = now
+        if event in ("connection.connect_tcp.started", "connection.connect_unix_socket.started"):
+            self.reused = False
+        if event.startswith("connection.") and event.endswith(".started"):
+            self._step_started = now
+        elif event.startswith("connection.") and self._step_started is not None:
+            self.connect_seconds += now - self._step_started
+            self._step_started = None
+        if self._chained is not None:
+            await self._chained(event, info)
+
+    def record(self, recorder: MetricsRecorder, route: str, injected_delay: float = 0.0):
+        if self.acquired is not None:
+            pool_wait = max(0.0, self.acquired - self.started - injected_delay)
+            recorder.record_connection(route, self.reused, self.connect_seconds, pool_wait)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport and records request latency (until the body is read) and payload size per route.
+
+    With `measure_decode=True` responses carry a json_codec.DECODE_HOOK, so
+    the harness's own response_json calls are timed per route; bodies nobody
+    decodes cost nothing. Connection reuse is traced on every request that
+    goes through httpcore. A "route" request extension (set e.g. by
+    RetryingTransport for retries) overrides the key of the latency, status
+    and error counts only; payload, decode, connection and per-test request
+    counts stay under the request's ROUTES endpoint, so the tables keyed by
+    endpoint never see those keys.
+    """
+
+    def __init__(self, recorder: MetricsRecorder, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 measure_decode: bool = False):
+        self.recorder = recorder
+        self.measure_decode = measure_decode
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        endpoint = route_key(request.method, request.url.path)
+        route = request.extensions.get("route") or endpoint
+        started = time.perf_counter()
+        trace = _ConnectionTrace(started, request.extensions.get("trace"))
+        # Reset per attempt, since retries re-send the same request
+        request.extensions = {**request.extensions, "trace": trace, INJECTED_DELAY: 0.0}
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            self.recorder.record(route, time.perf_counter() - started, None, endpoint)
+            trace.record(self.recorder, endpoint, request.extensions[INJECTED_DELAY])
+            raise
+
+        def finish(stream):
+            recorder = self.recorder
+            recorder.record(route, time.perf_counter() - started, response.status_code, endpoint)
+            trace.record(recorder, endpoint, request.extensions[INJECTED_DELAY])
+            recorder.record_payload(endpoint, stream.body_bytes, header_size(response))
+
+        response.stream = _RecordingStream(response.stream, finish)
+        if self.measure_decode:
+            response.extensions = {**response.extensions,
+                                   json_codec.DECODE_HOOK: lambda seconds: self.recorder.record_decode(endpoint, seconds)}
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
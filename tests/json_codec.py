@@ -0,0 +1,79 @@
+import json
+import os
+import time
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, see README
+    orjson = None
+
+"""
+JSON encoding and decoding for the harness hot paths (load scenarios, batch
+helpers, instrumentation). Uses orjson when it is installed and the stdlib
+otherwise; set TEST_JSON_CODEC=json to force the stdlib. Both produce compact
+UTF-8, so request bodies are byte-identical whichever backend is active.
+"""
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+# Response extension holding a callback(seconds) that response_json reports its decode time to
+DECODE_HOOK = "on_json_decode"
+
+BACKEND = "orjson" if orjson is not None and os.getenv("TEST_JSON_CODEC", "auto") != "json" else "json"
+
+if BACKEND == "orjson":
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    loads = json.loads
+
+
+def response_json(response):
+    """Decode a response body with the active codec (drop-in for `response.json()`).
+
+    Responses from an InstrumentedTransport with `measure_decode` carry a
+    DECODE_HOOK, and the time spent decoding is reported to it.
+    """
+    on_decode = response.extensions.get(DECODE_HOOK)
+    if on_decode is None:
+        return loads(response.content)
+    content = response.content
+    started = time.perf_counter()
+    decoded = loads(content)
+    on_decode(time.perf_counter() - started)
+    return decoded
+
+def json_request(obj) -> dict:
+    """Keyword arguments sending `obj` as a JSON body: `client.post(url, **json_request(body))`"""
+    return {"content": dumps(obj), "headers": JSON_HEADERS}
+
+
+class EncodedBody:
+    """A request body serialized once and re-sent as the same bytes on every request."""
+
+    __slots__ = ("content",)
+
+    def __init__(self, obj):
+        self.content = dumps(obj)
+
+    def request(self, headers: dict = None) -> dict:
+        """Keyword arguments for httpx, e.g. `client.post(url, **body.request())`"""
+        return {"content": self.content, "headers": {**JSON_HEADERS, **headers} if headers else JSON_HEADERS}
+
+
+class EncodedFields:
+    """Fixed members of a JSON object, encoded once and completed with the per-request members."""
+
+    __slots__ = ("keys", "_fragment")
+
+    def __init__(self, obj: dict):
+        self.keys = frozenset(obj)
+        self._fragment = dumps(obj)[1:-1]
+
+    def request(self, obj: dict, headers: dict = None) -> dict:
+        """Keyword arguments sending the fixed members plus `obj`, whose keys must not repeat them"""
+        rest = dumps(obj)
+        content = b"{" + self._fragment + (b"," + rest[1:] if len(rest) > 2 else b"}")
+        return {"content": content, "headers": {**JSON_HEADERS, **headers} if headers else JSON_HEADERS}
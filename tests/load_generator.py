@@ -0,0 +1,467 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from tests import data_factory
+from tests.fault_injection import FaultInjectingTransport, fault_summary, load_faults, merge_injected
+from tests.instrumentation import (InstrumentedTransport, MetricsRecorder, check_payload_regressions,
+                                   load_payload_budgets, payload_baseline)
+from tests.json_codec import EncodedBody, json_request, response_json
+from tests.retry_policy import RetryingTransport, load_retry_policy, merge_retry_stats, retry_summary
+from tests.report_exporters import detail_export, export_results, parse_formats
+from tests.report_generator import DETAIL_MAX_ROWS, TestReportGenerator
+from tests.report_history import HISTORY_RUNS, append_run, load_history, run_record
+from tests.workload import WorkloadProfile
+from tests.utils import (
+    DEFAULT_PASSWORD, ROUTES, auth_headers, generate_unique_email, login_body, mint_token, register_test_user,
+    register_test_users, run_bounded,
+)
+
+"""
+Multi-process load generator for the auth service. Each worker process runs
+its own event loop and AsyncClient pool against its own share of
+pre-provisioned users; per-process histograms are merged into one result.
+Provisioned users and profile traffic follow a WorkloadProfile, and
+--soak-window keeps one latency snapshot per window for long soak runs, and
+--faults injects latency, dropped connections and 5xx errors per route.
+--retry-policy applies per-route timeouts and retries to the measured load.
+
+    python -m tests.load_generator --processes 4 --users 200 --duration 30
+    python -m tests.load_generator --duration 3600 --soak-window 60 --workload workload.json
+"""
+
+load_dotenv()
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+
+async def scenario_verify_token(client, user, workload):
+    response = await client.post(ROUTES["verify_token"], headers=user["headers"])
+    return response.status_code == 200 and "user_id" in response_json(response)
+
+async def scenario_verify_minted_token(client, user, workload):
+    """verify_token with a locally minted token, so token supply never needs a login (needs JWT_SECRET_KEY)"""
+    response = await client.post(ROUTES["verify_token"], headers=auth_headers(mint_token(user["user_id"])))
+    return response.status_code == 200 and "user_id" in response_json(response)
+
+async def scenario_profile(client, user, workload):
+    response = await client.get(ROUTES["profile"], headers=user["headers"])
+    return response.status_code == 200 and response_json(response)["email"] == user["email"]
+
+async def scenario_login(client, user, workload):
+    response = await client.post(ROUTES["login"], **user["login_body"].request())
+    return response.status_code == 200
+
+async def scenario_update_profile(client, user, workload):
+    if user["user_type"] == "clinic":
+        payload = {"name": user["name"], "phone": user["phone"], "locality": workload.locality()}
+        request = json_request(payload)
+        request["headers"] = {**request["headers"], **user["headers"]}
+    else:
+        request = user["profile_body"].request(user["headers"])
+    response = await client.patch(ROUTES["update_profile"], **request)
+    return response.status_code == 200
+
+async def scenario_profile_traffic(client, user, workload):
+    """Profile reads and update_profile writes in the workload's read:write ratio"""
+    scenario = scenario_update_profile if workload.is_profile_write() else scenario_profile
+    return await scenario(client, user, workload)
+
+async def scenario_mixed(client, user, workload):
+    scenario = random.choice([scenario_verify_token, scenario_profile_traffic, scenario_login])
+    return await scenario(client, user, workload)
+
+# Bodies that never change between iterations are encoded once
+_OWNER_UPDATE_BODY = EncodedBody({"name": "Updated Owner Name", "phone": "573009876543"})
+_OWNER_CHANGE_PASSWORD_BODY = EncodedBody({
+    "currentPassword": DEFAULT_PASSWORD,
+    "newPassword": "NewPassword123!",
+    "confirmPassword": "NewPassword123!"
+})
+_CLINIC_UPDATE_BODY = EncodedBody({"name": "Updated Clinic Name", "locality": "Usaquén"})
+
+async def scenario_lifecycle_owner(client, user, workload):
+    """Same flow as test_complete_user_lifecycle_owner, on a fresh account per iteration"""
+    email = generate_unique_email("lifecycle_owner")
+    new_password = "NewPassword123!"
+    register_response = await register_test_user(client, email=email, name="Lifecycle Test Owner")
+    if register_response.status_code != 201:
+        return False
+    token = response_json(register_response)["token"]
+
+    headers = auth_headers(token)
+    steps = [
+        await client.post(ROUTES["verify_token"], headers=headers),
+        await client.get(ROUTES["profile"], headers=headers),
+        await client.patch(ROUTES["update_profile"], **_OWNER_UPDATE_BODY.request(headers)),
+        await client.put(ROUTES["change_password"], **_OWNER_CHANGE_PASSWORD_BODY.request(headers)),
+    ]
+    login_response = await client.post(ROUTES["login"], **json_request({"email": email, "password": new_password}))
+    steps.append(login_response)
+    if login_response.status_code != 200:
+        return False
+
+    steps.append(await client.delete(ROUTES["delete_account"], headers=auth_headers(response_json(login_response)["token"])))
+    return all(response.status_code == 200 for response in steps)
+
+async def scenario_lifecycle_clinic(client, user, workload):
+    """Same flow as test_complete_user_lifecycle_clinic, on a fresh account per iteration"""
+    register_response = await register_test_user(
+        client,
+        email=generate_unique_email("lifecycle_clinic"),
+        user_type="clinic",
+        name="Lifecycle Test Clinic",
+        locality="Chapinero"
+    )
+    if register_response.status_code != 201:
+        return False
+    token = response_json(register_response)["token"]
+
+    headers = auth_headers(token)
+    steps = [
+        await client.get(ROUTES["profile"], headers=headers),
+        await client.patch(ROUTES["update_profile"], **_CLINIC_UPDATE_BODY.request(headers)),
+        await client.get(ROUTES["profile"], headers=headers),
+    ]
+    return all(response.status_code == 200 for response in steps)
+
+async def scenario_password_reset(client, user, workload):
+    """Same flow as test_password_reset_flow_complete, on a fresh account per iteration"""
+    email = generate_unique_email("reset_flow")
+    new_password = "NewFlowPass456!"
+
+    register_response = await register_test_user(client, email=email, name="Reset Flow Test")
+    if register_response.status_code != 201:
+        return False
+
+    email_body = json_request({"email": email})
+    forgot_response = await client.post(ROUTES["forgot_password"], **email_body)
+    token_response = await client.post(ROUTES["debug_reset_token"], **email_body)
+    if token_response.status_code != 200:
+        return False
+
+    reset_response = await client.post(ROUTES["reset_password"], **json_request({
+        "token": response_json(token_response)["token"],
+        "newPassword": new_password,
+        "confirmPassword": new_password
+    }))
+    login_response = await client.post(ROUTES["login"], **json_request({"email": email, "password": new_password}))
+    return all(response.status_code == 200 for response in [forgot_response, reset_response, login_response])
+
+SCENARIOS = {
+    "verify_token": scenario_verify_token,
+    "verify_minted_token": scenario_verify_minted_token,
+    "profile": scenario_profile,
+    "profile_traffic": scenario_profile_traffic,
+    "login": scenario_login,
+    "mixed": scenario_mixed,
+    "lifecycle_owner": scenario_lifecycle_owner,
+    "lifecycle_clinic": scenario_lifecycle_clinic,
+    "password_reset": scenario_password_reset,
+}
+
+
+async def provision_users(client, count: int, workload: WorkloadProfile, prefix: str = "load",
+                          concurrency: int = 20) -> list:
+    """Register `count` users in the workload's owner:clinic mix, returning credentials, tokens and user ids"""
+    specs = list(workload.user_specs(data_factory.default_factory(), count, prefix))
+    registered = await register_test_users(client, specs, concurrency)
+    failed = [result for result in registered if not result["ok"]]
+    assert not failed, f"User registration failed: {failed[0]['error']}"
+
+    async def verify(item):
+        spec, result = item
+        headers = auth_headers(result["token"])
+        response = await client.post(ROUTES["verify_token"], headers=headers)
+        return {
+            **spec,
+            "password": DEFAULT_PASSWORD,
+            "token": result["token"],
+            "user_id": response_json(response).get("user_id"),
+            # Static per-user request parts, built once instead of on every iteration
+            "headers": headers,
+            "login_body": login_body(spec["email"]),
+            "profile_body": EncodedBody({"name": spec["name"], "phone": spec["phone"]}),
+        }
+
+    return await run_bounded(list(zip(specs, registered)), verify, concurrency)
+
+
+async def _run_worker_async(config: dict) -> dict:
+    pool_size = config.get("max_connections") or config["concurrency"]
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    scenario = SCENARIOS[config["scenario"]]
+    seed = config["workload"].get("seed", 0) + zlib.crc32(f"{config['user_prefix']}_{config['worker']}".encode())
+    workload = WorkloadProfile.from_dict(config["workload"], seed=seed)
+    # Faults are switched on after provisioning, so they only hit the measured load
+    faulty = FaultInjectingTransport({}, httpx.AsyncHTTPTransport(limits=limits), seed=seed)
+    transport = InstrumentedTransport(MetricsRecorder(), faulty, measure_decode=config["measure_decode"])
+    retrying = RetryingTransport({}, transport, seed=seed)
+
+    async with httpx.AsyncClient(base_url=config["api_url"], transport=retrying, timeout=config["timeout"]) as client:
+        users = await provision_users(client, config["users"], workload)
+
+        transport.recorder = MetricsRecorder()
+        faulty.faults = config.get("faults") or {}
+        retrying.policy = config.get("retry_policy") or {}
+        windows = []
+        window_seconds = []
+        iterations = 0
+        failures = 0
+        timeouts = 0
+        started = time.perf_counter()
+        deadline = started + config["duration"]
+
+        async def virtual_user(user):
+            nonlocal iterations, failures, timeouts
+            while time.perf_counter() < deadline:
+                try:
+                    ok = await scenario(client, user, workload)
+                except httpx.TimeoutException:
+                    ok = False
+                    timeouts += 1
+                except httpx.HTTPError:
+                    ok = False
+                iterations += 1
+                if not ok:
+                    failures += 1
+
+        async def rotate_windows():
+            window_started = started
+            while time.perf_counter() < deadline:
+                await asyncio.sleep(min(config["window"], max(0.0, deadline - time.perf_counter())))
+                windows.append(transport.recorder)
+                transport.recorder = MetricsRecorder()
+                # The last window is cut short by the deadline, so keep each window's real length for its RPS
+                now = time.perf_counter()
+                window_seconds.append(now - window_started)
+                window_started = now
+
+        tasks = [virtual_user(users[i % len(users)]) for i in range(config["concurrency"])]
+        if config["window"]:
+            tasks.append(rotate_windows())
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    recorder = transport.recorder
+    for window in windows:
+        recorder.merge(window)
+
+    return {
+        "scenario": config["scenario"],
+        "recorder": recorder,
+        "windows": windows,
+        "window_seconds": window_seconds,
+        "elapsed": elapsed,
+        "iterations": iterations,
+        "failures": failures,
+        "timeouts": timeouts,
+        "faults": faulty.injected,
+        "retries": retrying.stats,
+    }
+
+def _run_worker(config: dict) -> dict:
+    data_factory.configure(worker=f"{config['user_prefix']}_w{config['worker']}")
+    return asyncio.run(_run_worker_async(config))
+
+
+def merge_windows(merged: list, windows: list):
+    """Merge soak windows index by index into `merged`"""
+    for index, window in enumerate(windows):
+        if index == len(merged):
+            merged.append(MetricsRecorder())
+        merged[index].merge(window)
+
+def merge_window_seconds(merged: list, window_seconds: list):
+    """Keep the longest length seen for each soak window index in `merged`"""
+    for index, seconds in enumerate(window_seconds):
+        if index == len(merged):
+            merged.append(0.0)
+        merged[index] = max(merged[index], seconds)
+
+def merge_results(results: list) -> dict:
+    """Merge worker results into one recorder plus per-scenario iteration counts"""
+    recorder = MetricsRecorder()
+    windows = []
+    window_seconds = []
+    scenarios = {}
+    faults = {}
+    retries = {}
+    for result in results:
+        recorder.merge(result["recorder"])
+        merge_windows(windows, result.get("windows", []))
+        merge_window_seconds(window_seconds, result.get("window_seconds", []))
+        merge_injected(faults, result.get("faults", {}))
+        merge_retry_stats(retries, result.get("retries", {}))
+        totals = scenarios.setdefault(result["scenario"], {"iterations": 0, "failures": 0, "timeouts": 0,
+                                                           "workers": 0, "elapsed": 0.0})
+        totals["iterations"] += result["iterations"]
+        totals["failures"] += result["failures"]
+        totals["timeouts"] += result.get("timeouts", 0)
+        totals["workers"] += result.get("workers", 1)
+        totals["elapsed"] = max(totals["elapsed"], result["elapsed"])
+    return {
+        "recorder": recorder,
+        "windows": windows,
+        "window_seconds": window_seconds,
+        "scenarios": scenarios,
+        "elapsed": max((result["elapsed"] for result in results), default=0.0),
+        "iterations": sum(result["iterations"] for result in results),
+        "failures": sum(result["failures"] for result in results),
+        "timeouts": sum(result.get("timeouts", 0) for result in results),
+        "faults": faults,
+        "retries": retries,
+        "workers": sum(result.get("workers", 1) for result in results),
+    }
+
+def run_load(processes: int = 1, users: int = 10, concurrency: int = 10, duration: float = 10.0,
+             scenarios: tuple = ("mixed",), api_url: str = API_URL, timeout: float = 10.0,
+             user_prefix: str = "load", workload: Optional[WorkloadProfile] = None, window: float = 0.0,
+             measure_decode: bool = False, max_connections: Optional[int] = None,
+             faults: Optional[dict] = None, retry_policy: Optional[dict] = None) -> dict:
+    """Fan the load out over `processes` worker processes and merge their results.
+
+    Scenarios are assigned to worker processes round-robin. A non-zero `window`
+    turns the run into a soak run that also keeps one snapshot per window.
+    `max_connections` caps each process's connection pool (default: `concurrency`).
+    `faults` (see tests.fault_injection) is injected into the measured load, and
+    `retry_policy` (see tests.retry_policy) applies to it.
+    """
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Unknown scenarios {unknown}, expected any of {sorted(SCENARIOS)}")
+    processes = max(processes, len(scenarios))
+    workload = (workload or WorkloadProfile()).to_dict()
+
+    share, remainder = divmod(users, processes)
+    configs = [{
+        "worker": worker,
+        "users": max(1, share + (1 if worker < remainder else 0)),
+        "user_prefix": user_prefix,
+        "concurrency": concurrency,
+        "duration": duration,
+        "window": window,
+        "measure_decode": measure_decode,
+        "max_connections": max_connections,
+        "faults": faults,
+        "retry_policy": retry_policy,
+        "scenario": scenarios[worker % len(scenarios)],
+        "workload": workload,
+        "api_url": api_url,
+        "timeout": timeout,
+    } for worker in range(processes)]
+
+    if processes == 1:
+        return merge_results([_run_worker(configs[0])])
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return merge_results(list(executor.map(_run_worker, configs)))
+
+
+def build_report_results(result: dict) -> tuple:
+    """Turn a merged load result into (test_results, latency_metrics) for TestReportGenerator"""
+    test_results = [{
+        "name": f"load_{name} ({totals['iterations']} iteraciones, {totals['workers']} procesos"
+                + (f", {totals['timeouts']} timeouts)" if totals.get("timeouts") else ")"),
+        "outcome": "passed" if totals["failures"] == 0 else "failed",
+        "duration": totals["elapsed"],
+    } for name, totals in sorted(result["scenarios"].items())]
+    return test_results, result["recorder"].summary(result["elapsed"])
+
+
+def write_report(result: dict, prefix: str = "reporte_carga_auth_BE", window: float = 0.0,
+                 payload_budgets: Optional[dict] = None, formats: tuple = ("pdf",),
+                 faults: Optional[dict] = None, history_runs: int = HISTORY_RUNS) -> list:
+    """Write the requested report formats, returning their paths.
+
+    With `history_runs` 0 the run is neither compared with nor added to the history.
+    """
+    test_results, latency_metrics = build_report_results(result)
+    window_seconds = result.get("window_seconds") or [window] * len(result.get("windows", []))
+    latency_windows = [recorder.summary(seconds) for recorder, seconds in zip(result.get("windows", []), window_seconds)]
+    payload_metrics = result["recorder"].payload_summary()
+    connection_metrics = result["recorder"].connection_summary()
+    fault_metrics = fault_summary(faults or {}, result.get("faults", {}))
+    retry_metrics = retry_summary(result.get("retries", {}))
+    os.makedirs("reports", exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    base_path = f"reports/{prefix}_{timestamp}"
+    baseline = payload_baseline(load_history(kind=prefix, last=history_runs)) if history_runs else {}
+    if "pdf" in formats and len(test_results) > DETAIL_MAX_ROWS and "json" not in formats:
+        # The PDF only summarizes runs this large, so keep the full detail somewhere
+        formats = [*formats, "json"]
+    paths = export_results(test_results, base_path, formats, latency_metrics,
+                           {"payload": payload_metrics, "connections": connection_metrics,
+                            "faults": fault_metrics, "retries": retry_metrics, "windows": latency_windows,
+                            "payload_regressions": check_payload_regressions(payload_metrics, baseline)})
+    history = []
+    if history_runs:
+        append_run(run_record(prefix, test_results, latency_metrics, payload_metrics, duration=result["elapsed"]))
+        history = load_history(kind=prefix, last=history_runs)
+    if "pdf" in formats:
+        TestReportGenerator(test_results, latency_metrics, latency_windows=latency_windows, window_seconds=window,
+                            window_lengths=window_seconds,
+                            payload_metrics=payload_metrics,
+                            payload_budgets=payload_budgets,
+                            payload_baseline=baseline,
+                            connection_metrics=connection_metrics,
+                            fault_metrics=fault_metrics,
+                            retry_metrics=retry_metrics,
+                            export_path=detail_export(paths),
+                            history=history).generate_report(f"{base_path}.pdf")
+        paths.insert(0, f"{base_path}.pdf")
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-process load generator for the auth service")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--users", type=int, default=100, help="Total users, split across processes")
+    parser.add_argument("--concurrency", type=int, default=50, help="Virtual users per process")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per process")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=["mixed"])
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--workload", help="JSON workload profile (owner:clinic mix, localities, read:write)")
+    parser.add_argument("--soak-window", type=float, default=0.0,
+                        help="Soak mode: also report latency per window of this many seconds")
+    parser.add_argument("--measure-decode", action="store_true",
+                        help="Also time the JSON decodes the scenarios do (response_json) per endpoint")
+    parser.add_argument("--max-connections", type=int,
+                        help="Connection pool size per process (default: --concurrency)")
+    parser.add_argument("--faults", help="JSON fault profile: per-route latency, jitter, drop and 5xx rates")
+    parser.add_argument("--retry-policy", help="JSON per-route timeout/retry policy (default: no retries)")
+    parser.add_argument("--payload-budgets", help="JSON file of per-route response size/decode budgets")
+    parser.add_argument("--history-runs", type=int, default=HISTORY_RUNS,
+                        help="Runs from reports/history.jsonl to chart as trends (0 disables the history)")
+    parser.add_argument("--report-formats", type=parse_formats, default=["pdf"],
+                        help="Comma-separated report formats: pdf, json, junit, csv")
+    args = parser.parse_args(argv)
+
+    workload = WorkloadProfile.load(args.workload) if args.workload else None
+    faults = load_faults(args.faults)
+    retry_policy = load_retry_policy(args.retry_policy) if args.retry_policy else None
+    result = run_load(args.processes, args.users, args.concurrency, args.duration,
+                      tuple(args.scenario), args.api_url, args.timeout,
+                      workload=workload, window=args.soak_window, measure_decode=args.measure_decode,
+                      max_connections=args.max_connections, faults=faults,
+                      retry_policy=retry_policy)
+    prefix = "reporte_soak_auth_BE" if args.soak_window else "reporte_carga_auth_BE"
+    paths = write_report(result, prefix, args.soak_window, load_payload_budgets(args.payload_budgets),
+                         args.report_formats, faults, args.history_runs)
+    print(f"{result['iterations']} iterations, {result['failures']} failures ({result['timeouts']} timeouts) "
+          f"in {result['elapsed']:.2f}s "
+          f"-> {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from tests.db import APP_NAME
+
+"""
+Per-test capture of the Mongo profiler. While a test runs, the profiler is set
+to level 2 on the test database; afterwards the operations the service ran
+against the auth collections are read back from `system.profile` and flagged
+when they scanned a whole collection or ran slower than `slow_ms`.
+"""
+
+PROFILED_COLLECTIONS = ("users", "revoked_tokens")
+
+
+def _query_filter(command: dict) -> dict:
+    for key in ("filter", "q", "query"):
+        if isinstance(command.get(key), dict):
+            return command[key]
+    for stage in command.get("pipeline", []):
+        if "$match" in stage:
+            return stage["$match"]
+    return {}
+
+def query_shape(query: dict) -> tuple:
+    """Field names a query filters on, ignoring values and top-level operators like $and"""
+    fields = []
+    for key, value in query.items():
+        if key.startswith("$"):
+            if isinstance(value, list):
+                for clause in value:
+                    if isinstance(clause, dict):
+                        fields.extend(query_shape(clause))
+            continue
+        fields.append(key)
+    return tuple(sorted(set(fields)))
+
+def summarize_operation(entry: dict, slow_ms: int) -> dict:
+    command = entry.get("command", {})
+    plan = entry.get("planSummary", "")
+    millis = entry.get("millis", 0)
+    flags = []
+    if "COLLSCAN" in plan:
+        flags.append("COLLSCAN")
+    if millis >= slow_ms:
+        flags.append("SLOW")
+    return {
+        "collection": entry.get("ns", "").split(".", 1)[-1],
+        "op": entry.get("op"),
+        "plan": plan,
+        "millis": millis,
+        "docs_examined": entry.get("docsExamined", 0),
+        "keys_examined": entry.get("keysExamined", 0),
+        "returned": entry.get("nreturned", 0),
+        "shape": query_shape(_query_filter(command)),
+        "flags": flags,
+    }
+
+
+class QueryCapture:
+    """Profiler window for one test: `start()`, run the test, then `collect()` and `stop()`."""
+
+    def __init__(self, db, slow_ms: int = 100):
+        self.db = db
+        self.slow_ms = slow_ms
+        self.operations = []
+        self._previous = None
+        self._watermark = None
+
+    async def start(self):
+        self._previous = await self.db.command("profile", 2, slowms=self.slow_ms)
+        latest = await self.db["system.profile"].find({}, {"ts": 1}).sort("ts", -1).limit(1).to_list(1)
+        self._watermark = latest[0]["ts"] if latest else None
+
+    async def collect(self) -> list:
+        """Read the service's operations since `start()` (or the previous collect)"""
+        query = {
+            "ns": {"$in": [f"{self.db.name}.{name}" for name in PROFILED_COLLECTIONS]},
+            "appName": {"$ne": APP_NAME},
+        }
+        if self._watermark is not None:
+            query["ts"] = {"$gt": self._watermark}
+
+        entries = await self.db["system.profile"].find(query).sort("ts", 1).to_list(None)
+        if entries:
+            self._watermark = entries[-1]["ts"]
+        operations = [summarize_operation(entry, self.slow_ms) for entry in entries]
+        self.operations.extend(operations)
+        return operations
+
+    async def stop(self):
+        if self._previous is not None:
+            await self.db.command("profile", self._previous.get("was", 0), slowms=self._previous.get("slowms", 100))
+
+    def flagged(self) -> list:
+        return [operation for operation in self.operations if operation["flags"]]
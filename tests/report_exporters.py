@@ -0,0 +1,188 @@
+import csv
+import json
+import re
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Iterable, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+"""
+Machine-readable exports of the report data model: JSON, JUnit XML and CSV.
+All requested formats are written in a single pass over the results, one
+result at a time, so the results can be a generator and never need to be
+held in memory:
+
+    export_results(results, "reports/reporte", ["json", "junit", "csv"], latency_metrics)
+"""
+
+EXPORT_FORMATS = ("json", "junit", "csv")
+CSV_FIELDS = ("name", "nodeid", "outcome", "duration", "message")
+LATENCY_FIELDS = ("count", "errors", "mean", "p50", "p95", "p99", "max", "rps")
+# Characters XML 1.0 does not allow at all, not even escaped (e.g. control bytes echoed from a response)
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def xml_text(value) -> str:
+    """`value` as a string with XML-invalid characters dropped, ready for escape() or quoteattr()"""
+    return _XML_INVALID.sub("", str(value))
+
+
+class _Totals:
+    def __init__(self):
+        self.total = 0
+        self.outcomes = {"passed": 0, "failed": 0, "skipped": 0}
+        self.duration = 0.0
+
+    def add(self, result: dict):
+        self.total += 1
+        self.outcomes[result["outcome"]] = self.outcomes.get(result["outcome"], 0) + 1
+        self.duration += result.get("duration", 0)
+
+    def to_dict(self) -> dict:
+        return {"total": self.total, **self.outcomes, "duration": self.duration}
+
+
+class JsonExporter:
+    """{"generated_at", "latency", ..., "tests": [...], "summary": {...}}, with tests streamed as they arrive."""
+
+    extension = ".json"
+
+    def __init__(self, path: str, latency_metrics: dict, extra: Optional[dict] = None):
+        self.path = path
+        self._totals = _Totals()
+        self._first = True
+        self._handle = open(path, "w", encoding="utf-8")
+        header = {"generated_at": datetime.now().isoformat(), "latency": latency_metrics, **(extra or {})}
+        self._handle.write("{")
+        for key, value in header.items():
+            self._handle.write(f"{json.dumps(key)}: {json.dumps(value, default=str)}, ")
+        self._handle.write('"tests": [\n')
+
+    def add(self, result: dict):
+        self._totals.add(result)
+        self._handle.write(("" if self._first else ",\n") + json.dumps(result, default=str))
+        self._first = False
+
+    def close(self):
+        self._handle.write(f'\n], "summary": {json.dumps(self._totals.to_dict())}}}\n')
+        self._handle.close()
+
+
+class JUnitExporter:
+    """One <testsuite> with latency metrics as properties.
+
+    Test cases are spooled to a temporary file first, because the suite's
+    counters must precede them.
+    """
+
+    extension = ".xml"
+
+    def __init__(self, path: str, latency_metrics: dict, suite_name: str = "auth-service-tests"):
+        self.path = path
+        self.suite_name = suite_name
+        self.latency_metrics = latency_metrics
+        self._totals = _Totals()
+        self._cases = tempfile.SpooledTemporaryFile(max_size=1 << 20, mode="w+", encoding="utf-8")
+
+    def add(self, result: dict):
+        self._totals.add(result)
+        nodeid = result.get("nodeid", result["name"])
+        classname = nodeid.split("::", 1)[0].replace("/", ".").removesuffix(".py")
+        case = (f'  <testcase classname={quoteattr(xml_text(classname))} name={quoteattr(xml_text(result["name"]))} '
+                f'time="{result.get("duration", 0):.6f}"')
+        if result["outcome"] == "failed":
+            # Fall back after stripping, since a message of only control characters strips to ""
+            message = xml_text(result.get("message") or "") or "failed"
+            case += (f'>\n    <failure message={quoteattr((message.splitlines() or ["failed"])[-1][:200])}>'
+                     f'{escape(message)}</failure>\n  </testcase>\n')
+        elif result["outcome"] == "skipped":
+            case += '>\n    <skipped/>\n  </testcase>\n'
+        else:
+            case += '/>\n'
+        self._cases.write(case)
+
+    def close(self):
+        totals = self._totals
+        with open(self.path, "w", encoding="utf-8") as handle:
+            handle.write('<?xml version="1.0" encoding="utf-8"?>\n')
+            handle.write(f'<testsuite name={quoteattr(self.suite_name)} tests="{totals.total}" '
+                         f'failures="{totals.outcomes.get("failed", 0)}" errors="0" '
+                         f'skipped="{totals.outcomes.get("skipped", 0)}" time="{totals.duration:.6f}" '
+                         f'timestamp="{datetime.now().isoformat()}">\n')
+            handle.write('  <properties>\n')
+            for route, stats in self.latency_metrics.items():
+                for field in LATENCY_FIELDS:
+                    if field in stats:
+                        handle.write(f'    <property name={quoteattr(xml_text(f"latency.{route}.{field}"))} '
+                                     f'value="{stats[field]}"/>\n')
+            handle.write('  </properties>\n')
+            self._cases.seek(0)
+            shutil.copyfileobj(self._cases, handle)
+            handle.write('</testsuite>\n')
+        self._cases.close()
+
+
+class CsvExporter:
+    """`<base>.csv` with one row per test plus `<base>_latencia.csv` with one row per endpoint."""
+
+    extension = ".csv"
+
+    def __init__(self, path: str, latency_metrics: dict):
+        self.path = path
+        self.latency_path = path[:-len(self.extension)] + "_latencia" + self.extension
+        with open(self.latency_path, "w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(("endpoint",) + LATENCY_FIELDS)
+            for route, stats in latency_metrics.items():
+                writer.writerow((route,) + tuple(stats.get(field, "") for field in LATENCY_FIELDS))
+        self._handle = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._handle, CSV_FIELDS, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def add(self, result: dict):
+        self._writer.writerow(result)
+
+    def close(self):
+        self._handle.close()
+
+
+EXPORTERS = {"json": JsonExporter, "junit": JUnitExporter, "csv": CsvExporter}
+
+
+def export_results(results: Iterable[dict], base_path: str, formats: Iterable[str],
+                   latency_metrics: Optional[dict] = None, extra: Optional[dict] = None) -> list:
+    """Write every requested format in one pass over `results`, returning the written paths.
+
+    `extra` holds additional top-level sections for the JSON export (e.g. payload metrics).
+    """
+    latency_metrics = latency_metrics or {}
+    exporters = []
+    for name in formats:
+        if name not in EXPORTERS:
+            continue
+        path = base_path + EXPORTERS[name].extension
+        if name == "json":
+            exporters.append(JsonExporter(path, latency_metrics, extra))
+        else:
+            exporters.append(EXPORTERS[name](path, latency_metrics))
+    try:
+        for result in results:
+            for exporter in exporters:
+                exporter.add(result)
+    finally:
+        for exporter in exporters:
+            exporter.close()
+    return [exporter.path for exporter in exporters]
+
+def parse_formats(value: str) -> list:
+    """Parse a comma-separated --report-formats value such as 'pdf,json,junit'"""
+    formats = [name.strip().lower() for name in value.split(",") if name.strip()]
+    unknown = [name for name in formats if name != "pdf" and name not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"Unknown report formats {unknown}, expected any of {['pdf', *EXPORT_FORMATS]}")
+    return formats
+
+def detail_export(paths: list) -> Optional[str]:
+    """The export a PDF points readers to: the JSON one, the only format with every failure's detail"""
+    return next((path for path in paths if path.endswith(JsonExporter.extension)), paths[0] if paths else None)
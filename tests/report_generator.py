@@ -6,20 +6,209 @@ from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER
 from reportlab.graphics.shapes import Drawing, String, Rect
 from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.legends import Legend
 from datetime import datetime
+from functools import lru_cache
+import heapq
+import itertools
+import math
+from io import BytesIO
 import os
 
+from PIL import Image as PILImage
+
+from tests.instrumentation import PAYLOAD_REGRESSION_TOLERANCE, check_payload_budgets, check_payload_regressions
+from tests.rerun_stats import FLAKY, SLOW_OUTLIER, STABLE
+from tests.utils import ROUTES, module_routes
+
+SERIES_COLORS = [
+    colors.HexColor('#345D9D'), colors.HexColor('#E74C3C'), colors.HexColor('#27AE60'),
+    colors.HexColor('#F39C12'), colors.HexColor('#8E44AD'), colors.HexColor('#16A085'),
+    colors.HexColor('#D35400'), colors.HexColor('#2C3E50'), colors.HexColor('#C0392B'),
+    colors.HexColor('#7F8C8D'), colors.HexColor('#2980B9'), colors.HexColor('#F1C40F'),
+]
+
+LOGO_PATH = "assets/logo.png"
+LOGO_WIDTH = 3*inch
+LOGO_HEIGHT = 1.5*inch
+LOGO_DPI = 200
+
+HEADER_COLOR = colors.Color(0.2, 0.4, 0.8)
+
+# Static table styles, shared by every report instead of being rebuilt per table
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 14),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 1), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, HEADER_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+# Detailed results are split into tables of this many rows (about one page each)
+DETAIL_ROWS_PER_TABLE = 40
+# Above this many results the detailed section only lists the first failures and the slowest tests
+DETAIL_MAX_ROWS = 2000
+DETAIL_MAX_FAILURES = 500
+DETAIL_TOP_SLOWEST = 50
+
+DETAIL_TABLE_COMMANDS = [
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, HEADER_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.Color(0.95, 0.95, 0.95)]),
+]
+DETAIL_TABLE_STYLE = TableStyle(DETAIL_TABLE_COMMANDS)
+
+# Metric tables (latency, payload, ...) with a small font
+METRIC_TABLE_COMMANDS = [
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 1, HEADER_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+]
+METRIC_TABLE_STYLE = TableStyle(METRIC_TABLE_COMMANDS)
+
+# Heatmaps show at most this many tests (the ones with the most requests/time)
+HEATMAP_MAX_TESTS = 30
+SETUP_ROUTES = ("register_owner", "register_clinic", "login")
+ROUTE_LABELS = {
+    "register_owner": "reg. dueño", "register_clinic": "reg. clínica", "login": "login", "logout": "logout",
+    "forgot_password": "olvido", "reset_password": "reset", "change_password": "cambio clave",
+    "verify_token": "verify", "debug_reset_token": "debug reset", "profile": "perfil",
+    "update_profile": "act. perfil", "delete_account": "borrar",
+}
+
+
+def setup_share(result: dict) -> float:
+    """Fraction of a test's requests spent on register/login when those are not the routes it tests"""
+    requests = result.get('requests', {})
+    total = sum(cell['count'] for cell in requests.values())
+    if not total:
+        return 0.0
+    targets = set(module_routes(result.get('nodeid', '')))
+    setup = sum(cell['count'] for route, cell in requests.items() if route in SETUP_ROUTES and route not in targets)
+    return setup / total
+
+# Compact tables (Mongo findings, index health)
+COMPACT_TABLE_COMMANDS = [
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('GRID', (0, 0), (-1, -1), 1, HEADER_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+]
+COMPACT_TABLE_STYLE = TableStyle(COMPACT_TABLE_COMMANDS)
+MONGO_FINDINGS_TABLE_STYLE = TableStyle([
+    *COMPACT_TABLE_COMMANDS,
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('TEXTCOLOR', (-1, 1), (-1, -1), colors.HexColor('#E74C3C')),
+])
+
+ACADEMIC_INFORMATION = """
+<b><font size=18>Universidad Nacional de Colombia</font></b><br/><br/>
+<b>Facultad de Ingeniería</b><br/>
+<b>Ingeniería de Sistemas y Computación</b><br/><br/>
+<b>Asignatura:</b> Ingeniería de Software II<br/>
+<b>Equipo:</b> Cobras
+"""
+
+
+@lru_cache(maxsize=None)
+def get_styles():
+    """Sample stylesheet plus the cover style, built once per process"""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        'AcademicInfo',
+        parent=styles['Normal'],
+        alignment=1,
+        fontName='Helvetica',
+        fontSize=14,
+        leading=22,
+        spaceAfter=12
+    ))
+    return styles
+
+@lru_cache(maxsize=None)
+def logo_bytes(path: str = LOGO_PATH):
+    """The logo decoded and downscaled once to its print size, or None if it is missing"""
+    if not os.path.exists(path):
+        return None
+    with PILImage.open(path) as image:
+        # The cover stretches the logo to LOGO_WIDTH x LOGO_HEIGHT whatever its aspect ratio, so each axis is
+        # scaled to its own print size instead of keeping the aspect ratio
+        size = (min(image.width, int(LOGO_WIDTH / inch * LOGO_DPI)),
+                min(image.height, int(LOGO_HEIGHT / inch * LOGO_DPI)))
+        encoded = BytesIO()
+        image.resize(size, PILImage.LANCZOS).save(encoded, format='PNG', optimize=True)
+    return encoded.getvalue()
+
+def academic_paragraph():
+    """Static part of the cover page. Flowables keep layout state, so every report gets its own"""
+    return Paragraph(ACADEMIC_INFORMATION, get_styles()['AcademicInfo'])
+
+
 class TestReportGenerator:
-    def __init__(self, test_results):
+    def __init__(self, test_results, latency_metrics=None, resource_samples=None, latency_timeline=None,
+                 index_report=None, latency_windows=None, window_seconds=0.0, payload_metrics=None,
+                 payload_budgets=None, export_path=None, detail_max_rows=DETAIL_MAX_ROWS,
+                 detail_top_slowest=DETAIL_TOP_SLOWEST, detail_max_failures=DETAIL_MAX_FAILURES, history=None, cold_start=None, connection_metrics=None,
+                 fault_metrics=None, retry_metrics=None, payload_baseline=None, window_lengths=None):
         self.test_results = test_results
-        self.styles = getSampleStyleSheet()
+        self.latency_metrics = latency_metrics or {}
+        self.resource_samples = resource_samples or []
+        self.latency_timeline = latency_timeline or []
+        self.index_report = index_report
+        self.latency_windows = latency_windows or []
+        self.window_seconds = window_seconds
+        # Real length of each window; the last one of a run is usually shorter than window_seconds
+        self.window_lengths = window_lengths or [window_seconds] * len(self.latency_windows)
+        self.payload_metrics = payload_metrics or {}
+        self.payload_budgets = payload_budgets
+        self.payload_baseline = payload_baseline or {}
+        self.export_path = export_path
+        self.detail_max_rows = detail_max_rows
+        self.detail_top_slowest = detail_top_slowest
+        self.detail_max_failures = detail_max_failures
+        self.history = history or []
+        self.cold_start = cold_start
+        self.connection_metrics = connection_metrics or {}
+        self.fault_metrics = fault_metrics or {}
+        self.retry_metrics = retry_metrics or {}
+        self.styles = get_styles()
 
     def create_cover(self):
         elements = []
 
-        logo_path = "assets/logo.png"
-        if os.path.exists(logo_path):
-            img = Image(logo_path, width=3*inch, height=1.5*inch)
+        logo = logo_bytes()
+        if logo:
+            img = Image(BytesIO(logo), width=LOGO_WIDTH, height=LOGO_HEIGHT)
             img.hAlign = 'CENTER'
             elements.append(Spacer(1, 0.5*inch))
             elements.append(img)
@@ -27,27 +216,12 @@ class TestReportGenerator:
         else:
             elements.append(Spacer(1, 2.2*inch))
 
-        academic_style = ParagraphStyle(
-            'AcademicInfo',
-            parent=self.styles['Normal'],
-            alignment=1,
-            fontName='Helvetica',
-            fontSize=14,
-            leading=22,
-            spaceAfter=12
-        )
-
-        academic_information = f"""
-        <b><font size=18>Universidad Nacional de Colombia</font></b><br/><br/>
-        <b>Facultad de Ingeniería</b><br/>
-        <b>Ingeniería de Sistemas y Computación</b><br/><br/>
-        <b>Asignatura:</b> Ingeniería de Software II<br/>
-        <b>Equipo:</b> Cobras<br/><br/>
-        <b>Fecha de generación:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-        """
-
-        ac_info = Paragraph(academic_information, academic_style)
-        elements.append(ac_info)
+        elements.append(academic_paragraph())
+        elements.append(Spacer(1, 10))
+        elements.append(Paragraph(
+            f"<b>Fecha de generación:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            self.styles['AcademicInfo']
+        ))
 
         elements.append(Spacer(1, 1.5*inch))
 
@@ -65,20 +239,7 @@ class TestReportGenerator:
         ]
         
         table = Table(data, colWidths=[3*inch, 3*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.2, 0.4, 0.8)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 1), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.Color(0.2, 0.4, 0.8)),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        table.setStyle(SUMMARY_TABLE_STYLE)
         
         return table
 
@@ -142,37 +303,529 @@ class TestReportGenerator:
         return drawing
 
 
-    def create_detailed_results(self):
-        """Create a detailed table of test results"""
-        data = [['Nombre de la prueba', 'Resultado', 'Duración (s)']]
+    def detailed_rows(self):
+        """Results for the detailed section: all of them, or the first failures plus the slowest tests past the cap"""
+        if len(self.test_results) <= self.detail_max_rows:
+            return self.test_results, False
+        failed = []
         for result in self.test_results:
-            status = 'Exitosa' if result['outcome'] == 'passed' else 'Fallida'
+            if result['outcome'] == 'failed':
+                failed.append(result)
+                if len(failed) == self.detail_max_failures:
+                    break
+        slowest = heapq.nlargest(self.detail_top_slowest,
+                                 (result for result in self.test_results if result['outcome'] != 'failed'),
+                                 key=lambda result: result.get('duration', 0))
+        return failed + slowest, True
+
+    def create_detailed_results(self):
+        """Create the detailed results as page-sized tables, summarized for very large runs"""
+        rows, summarized = self.detailed_rows()
+        elements = []
+        if summarized:
+            failed_total = sum(1 for result in self.test_results if result['outcome'] == 'failed')
+            failed_shown = min(failed_total, self.detail_max_failures)
+            failures = (f"todas las fallidas ({failed_total})" if failed_shown == failed_total
+                        else f"las primeras {failed_shown} de {failed_total} fallidas")
+            note = (f"Se muestran las {len(rows)} pruebas más relevantes de {len(self.test_results)}: "
+                    f"{failures} y las {self.detail_top_slowest} más lentas.")
+            if self.export_path:
+                note += f" El detalle completo está en <b>{self.export_path}</b>."
+            elements.append(Paragraph(note, self.styles['Normal']))
+            elements.append(Spacer(1, 12))
+
+        header = ['Nombre de la prueba', 'Resultado', 'Duración (s)']
+        for start in range(0, max(len(rows), 1), DETAIL_ROWS_PER_TABLE):
+            data = [header]
+            for result in rows[start:start + DETAIL_ROWS_PER_TABLE]:
+                status = 'Exitosa' if result['outcome'] == 'passed' else 'Fallida'
+                data.append([
+                    result['name'],
+                    status,
+                    f"{result.get('duration', 0):.2f}"
+                ])
+
+            table = Table(data, colWidths=[4*inch, 1.5*inch, 1.5*inch])
+            table.setStyle(DETAIL_TABLE_STYLE)
+            elements.append(table)
+
+        return elements
+
+    def create_latency_table(self):
+        """Create a per-endpoint latency table (milliseconds)"""
+        has_rps = any('rps' in stats for stats in self.latency_metrics.values())
+        header = ['Endpoint', 'Peticiones', 'Errores', 'p50', 'p95', 'p99', 'Máx']
+        if has_rps:
+            header.append('Req/s')
+        data = [header]
+        for route, stats in self.latency_metrics.items():
+            row = [
+                route,
+                stats['count'],
+                stats.get('errors', 0),
+                f"{stats['p50'] * 1000:.1f}",
+                f"{stats['p95'] * 1000:.1f}",
+                f"{stats['p99'] * 1000:.1f}",
+                f"{stats['max'] * 1000:.1f}",
+            ]
+            if has_rps:
+                row.append(f"{stats.get('rps', 0):.1f}")
+            data.append(row)
+
+        first_width = 1.8*inch if has_rps else 2.2*inch
+        other_width = (6.8*inch - first_width) / (len(header) - 1)
+        table = Table(data, colWidths=[first_width] + [other_width] * (len(header) - 1))
+        table.setStyle(METRIC_TABLE_STYLE)
+
+        return table
+
+    def create_payload_table(self):
+        """Create a per-endpoint response size / JSON decode table, marking routes over budget or over baseline"""
+        violations = check_payload_budgets(self.payload_metrics, self.payload_budgets)
+        regressions = check_payload_regressions(self.payload_metrics, self.payload_baseline)
+        data = [['Endpoint', 'Respuestas', 'Cuerpo medio (B)', 'Cuerpo máx (B)', 'Cabeceras (B)',
+                 'Decod. media (ms)', 'Decod. máx (ms)']]
+        for route, stats in self.payload_metrics.items():
+            data.append([
+                route,
+                stats['responses'],
+                f"{stats['body_bytes']:.0f}",
+                stats['max_body_bytes'],
+                f"{stats['header_bytes']:.0f}",
+                # Nothing decoded these responses, so there is no decode time to show
+                f"{stats['decode_ms']:.3f}" if stats['decode_ms'] is not None else "n/a",
+                f"{stats['max_decode_ms']:.3f}" if stats['max_decode_ms'] is not None else "n/a",
+            ])
+
+        columns = {'body_bytes': 3, 'max_body_bytes': 3, 'decode_ms': 5}
+        table = Table(data, colWidths=[1.7*inch] + [0.85*inch] * 6)
+        style = [*METRIC_TABLE_COMMANDS, ('FONTSIZE', (0, 0), (-1, -1), 8)]
+        for row, route in enumerate(self.payload_metrics, start=1):
+            # Budget violations are added last so red wins over orange
+            for field in regressions.get(route, []):
+                style.append(('TEXTCOLOR', (columns[field], row), (columns[field], row), colors.orange))
+                style.append(('FONTNAME', (columns[field], row), (columns[field], row), 'Helvetica-Bold'))
+            for budget in violations.get(route, []):
+                style.append(('TEXTCOLOR', (columns[budget], row), (columns[budget], row), colors.red))
+                style.append(('FONTNAME', (columns[budget], row), (columns[budget], row), 'Helvetica-Bold'))
+        table.setStyle(TableStyle(style))
+
+        return table
+
+    def create_connection_table(self):
+        """Create a per-endpoint connection reuse table with a run total"""
+        data = [['Endpoint', 'Peticiones', 'Nuevas', 'Reutilizadas', '% reuso',
+                 'Conexión (ms)', 'Espera pool (ms)', 'Espera máx (ms)']]
+        totals = {'requests': 0, 'new': 0, 'reused': 0, 'connect': 0.0, 'wait': 0.0, 'max_wait': 0.0}
+        for route, stats in self.connection_metrics.items():
+            data.append([
+                route,
+                stats['requests'],
+                stats['new'],
+                stats['reused'],
+                f"{stats['reuse_rate'] * 100:.1f}%",
+                f"{stats['connect_ms']:.2f}",
+                f"{stats['pool_wait_ms']:.2f}",
+                f"{stats['max_pool_wait_ms']:.2f}",
+            ])
+            totals['requests'] += stats['requests']
+            totals['new'] += stats['new']
+            totals['reused'] += stats['reused']
+            totals['connect'] += stats['connect_ms'] * stats['new']
+            totals['wait'] += stats['pool_wait_ms'] * stats['requests']
+            totals['max_wait'] = max(totals['max_wait'], stats['max_pool_wait_ms'])
+        requests = totals['requests'] or 1
+        data.append([
+            'Total',
+            totals['requests'],
+            totals['new'],
+            totals['reused'],
+            f"{totals['reused'] / requests * 100:.1f}%",
+            f"{totals['connect'] / (totals['new'] or 1):.2f}",
+            f"{totals['wait'] / requests:.2f}",
+            f"{totals['max_wait']:.2f}",
+        ])
+
+        table = Table(data, colWidths=[1.5*inch] + [0.72*inch] * 7)
+        table.setStyle(TableStyle([
+            *METRIC_TABLE_COMMANDS,
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ]))
+        return table
+
+    def create_fault_table(self):
+        """Create a per-endpoint table of the configured faults and how often each was injected"""
+        data = [['Endpoint', 'Latencia (ms)', '% caída', '% 5xx', 'Peticiones', 'Retraso medio (ms)',
+                 'Timeouts', 'Caídas', 'Errores 5xx']]
+        for route, stats in self.fault_metrics.items():
+            data.append([
+                route,
+                f"{stats['latency_ms']:g} ± {stats['jitter_ms']:g}",
+                f"{stats['drop_rate'] * 100:.1f}%",
+                f"{stats['error_rate'] * 100:.1f}%",
+                stats['requests'],
+                f"{stats['mean_delay_ms']:.1f}",
+                stats['timeouts'],
+                stats['dropped'],
+                stats['errors'],
+            ])
+        table = Table(data, colWidths=[1.4*inch] + [0.68*inch] * 8)
+        table.setStyle(TableStyle([*METRIC_TABLE_COMMANDS, ('FONTSIZE', (0, 0), (-1, -1), 7)]))
+        return table
+
+    def create_retry_table(self):
+        """Create a per-endpoint table of retries, timeouts and the latency they added"""
+        data = [['Endpoint', 'Peticiones', 'Reintentos', 'Timeouts', 'Recuperadas', 'Agotadas',
+                 'Sin presupuesto', 'Sobrecoste (ms)']]
+        for route, stats in self.retry_metrics.items():
+            data.append([
+                route,
+                stats['requests'],
+                stats['retries'],
+                stats['timeouts'],
+                stats['recovered'],
+                stats['exhausted'],
+                stats['budget_denied'],
+                f"{stats['overhead_ms']:.1f}",
+            ])
+        table = Table(data, colWidths=[1.5*inch] + [0.72*inch] * 7)
+        table.setStyle(TableStyle([*METRIC_TABLE_COMMANDS, ('FONTSIZE', (0, 0), (-1, -1), 8)]))
+        return table
+
+    def create_stability_section(self):
+        """Summarize --rerun-count statistics and list the flaky and slow-outlier tests"""
+        labels = {STABLE: 'Estable', FLAKY: 'Inestable', SLOW_OUTLIER: 'Lenta atípica'}
+        rerun = [result for result in self.test_results if 'stability' in result]
+        counts = {name: 0 for name in labels}
+        for result in rerun:
+            counts[result['stability']['classification']] += 1
+
+        # Runs differ between tests whose setup failed part-way; the table lists each test's own count
+        runs = sorted({result['stability']['runs'] for result in rerun})
+        times = f"{runs[0]} veces" if len(runs) == 1 else f"entre {runs[0]} y {runs[-1]} veces"
+        elements = [Paragraph(
+            f"{len(rerun)} pruebas ejecutadas {times}: " +
+            f"{counts[STABLE]} estables, {counts[FLAKY]} inestables, {counts[SLOW_OUTLIER]} lentas atípicas.",
+            self.styles['Normal'])]
+
+        unstable = sorted((result for result in rerun if result['stability']['classification'] != STABLE),
+                          key=lambda result: (-result['stability']['failure_rate'], -result['stability']['max']))
+        if not unstable:
+            return elements
+
+        data = [['Prueba', 'Ejec.', 'Fallos', 'Tasa fallo', 'Mediana (s)', 'Desv. (s)', 'Máx (s)', 'Clasificación']]
+        for result in unstable:
+            stats = result['stability']
             data.append([
                 result['name'],
-                status,
-                f"{result.get('duration', 0):.2f}"
+                stats['runs'],
+                stats['failures'],
+                f"{stats['failure_rate'] * 100:.0f}%",
+                f"{stats['median']:.2f}",
+                f"{stats['stdev']:.2f}",
+                f"{stats['max']:.2f}",
+                labels[stats['classification']],
             ])
-        
-        table = Table(data, colWidths=[4*inch, 1.5*inch, 1.5*inch])
+
+        table = Table(data, colWidths=[2.2*inch, 0.5*inch, 0.5*inch, 0.7*inch, 0.8*inch, 0.7*inch, 0.7*inch, 0.9*inch])
         table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.2, 0.4, 0.8)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.Color(0.2, 0.4, 0.8)),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            *[('BACKGROUND', (0, i), (-1, i), colors.Color(0.95, 0.95, 0.95)) for i in range(2, len(data), 2)]
+            *COMPACT_TABLE_COMMANDS,
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            *[('TEXTCOLOR', (-1, row), (-1, row),
+               colors.HexColor('#E74C3C') if result['stability']['classification'] == FLAKY else colors.HexColor('#F39C12'))
+              for row, result in enumerate(unstable, start=1)]
         ]))
-        
+        elements.append(Spacer(1, 6))
+        elements.append(table)
+        return elements
+
+    def create_route_coverage_table(self):
+        """Requests and tests per ROUTES endpoint; endpoints hit by at most one test are marked thin"""
+        totals = {route: [0, 0.0, 0] for route in ROUTES}
+        for result in self.test_results:
+            for route, cell in result.get('requests', {}).items():
+                total = totals.setdefault(route, [0, 0.0, 0])
+                total[0] += cell['count']
+                total[1] += cell['seconds']
+                total[2] += 1
+        all_requests = sum(total[0] for total in totals.values()) or 1
+
+        data = [['Endpoint', 'Peticiones', '% del total', 'Tiempo (s)', 'Pruebas']]
+        thin = []
+        for row, (route, (count, seconds, tests)) in enumerate(totals.items(), start=1):
+            data.append([route, count, f"{count / all_requests * 100:.1f}%", f"{seconds:.2f}", tests])
+            if tests <= 1:
+                thin.append(row)
+
+        table = Table(data, colWidths=[2*inch, 1.1*inch, 1.1*inch, 1.1*inch, 1.1*inch])
+        table.setStyle(TableStyle([
+            *METRIC_TABLE_COMMANDS,
+            *[('TEXTCOLOR', (0, row), (-1, row), colors.HexColor('#E74C3C')) for row in thin]
+        ]))
+        return table
+
+    def create_request_heatmap(self, title, value, unit_format):
+        """Heatmap table of tests x endpoints for the busiest tests; `value(cell)` picks count or time"""
+        tests = [result for result in self.test_results if result.get('requests')]
+        tests = heapq.nlargest(HEATMAP_MAX_TESTS, tests,
+                               key=lambda result: sum(value(cell) for cell in result['requests'].values()))
+        routes = [route for route in ROUTES if any(route in result['requests'] for result in tests)]
+        routes += sorted({route for result in tests for route in result['requests']} - set(routes))
+        peak = max((value(cell) for result in tests for cell in result['requests'].values()), default=0) or 1
+
+        data = [[title] + [ROUTE_LABELS.get(route, route) for route in routes] + ['% setup']]
+        style = [
+            *COMPACT_TABLE_COMMANDS,
+            ('FONTSIZE', (0, 0), (-1, -1), 6),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+        ]
+        for row, result in enumerate(tests, start=1):
+            cells = result['requests']
+            data.append([result['name'][:38]] + [
+                unit_format(value(cells[route])) if route in cells else '' for route in routes
+            ] + [f"{setup_share(result) * 100:.0f}%"])
+            for column, route in enumerate(routes, start=1):
+                if route in cells:
+                    # Log scale so a few registration-heavy tests don't wash out the rest
+                    intensity = math.log1p(value(cells[route])) / math.log1p(peak)
+                    style.append(('BACKGROUND', (column, row), (column, row),
+                                  colors.Color(1 - 0.8 * intensity, 1 - 0.6 * intensity, 1 - 0.2 * intensity)))
+
+        width = 4.8*inch / (len(routes) + 1)
+        table = Table(data, colWidths=[1.7*inch] + [width] * (len(routes) + 1), repeatRows=1)
+        table.setStyle(TableStyle(style))
+        return table
+
+    def create_request_sections(self):
+        elements = [self.create_route_coverage_table(), Spacer(1, 12)]
+        elements.append(Paragraph(
+            "Mapas de calor de las pruebas con más peticiones. '% setup' es la fracción de peticiones "
+            "de registro/login en pruebas cuyo endpoint objetivo es otro.", self.styles['Normal']))
+        elements.append(Spacer(1, 6))
+        elements.append(self.create_request_heatmap('Peticiones', lambda cell: cell['count'], str))
+        elements.append(Spacer(1, 12))
+        elements.append(self.create_request_heatmap('Tiempo (ms)', lambda cell: cell['seconds'] * 1000,
+                                                    lambda ms: f"{ms:.0f}"))
+        return elements
+
+    def create_mongo_findings_table(self):
+        """Create a table of the profiled queries flagged as COLLSCAN or slow"""
+        data = [['Prueba', 'Colección', 'Op', 'Plan', 'ms', 'Docs', 'Marca']]
+        for result in self.test_results:
+            for finding in result.get('mongo_findings', []):
+                data.append([
+                    Paragraph(result['name'], self.styles['BodyText']),
+                    finding['collection'],
+                    finding['op'],
+                    Paragraph(finding['plan'] or '-', self.styles['BodyText']),
+                    finding['millis'],
+                    finding['docs_examined'],
+                    ', '.join(finding['flags']),
+                ])
+
+        if len(data) == 1:
+            return Paragraph("El perfilador no marcó ninguna consulta (sin COLLSCAN ni consultas lentas).", self.styles['Normal'])
+
+        table = Table(data, colWidths=[1.9*inch, 0.9*inch, 0.6*inch, 1.4*inch, 0.5*inch, 0.6*inch, 0.9*inch], repeatRows=1)
+        table.setStyle(MONGO_FINDINGS_TABLE_STYLE)
+
         return table
 
+    def create_index_tables(self):
+        """Create the index check table and, if any, the recommended index table"""
+        elements = []
+        data = [['Colección', 'Verificación', 'Estado', 'Índice']]
+        for check in self.index_report['checks']:
+            data.append([check['collection'], check['check'], 'OK' if check['ok'] else 'Falta', check['index'] or '-'])
+
+        table = Table(data, colWidths=[1.4*inch, 2.6*inch, 0.9*inch, 1.9*inch])
+        table.setStyle(TableStyle([
+            *COMPACT_TABLE_COMMANDS,
+            *[('TEXTCOLOR', (2, i), (2, i), colors.HexColor('#E74C3C'))
+              for i, check in enumerate(self.index_report['checks'], start=1) if not check['ok']]
+        ]))
+        elements.append(table)
+        elements.append(Spacer(1, 12))
+
+        recommendations = self.index_report['recommendations']
+        if not recommendations:
+            elements.append(Paragraph("Todas las formas de consulta observadas tienen un índice que las atiende.", self.styles['Normal']))
+            return elements
+
+        data = [['Colección', 'Campos consultados', 'Consultas', 'Índice recomendado']]
+        for recommendation in recommendations:
+            data.append([
+                recommendation['collection'],
+                ', '.join(recommendation['shape']),
+                recommendation['count'],
+                Paragraph(str(recommendation['recommended']), self.styles['BodyText']),
+            ])
+        table = Table(data, colWidths=[1.4*inch, 2.0*inch, 0.9*inch, 2.5*inch], repeatRows=1)
+        table.setStyle(COMPACT_TABLE_STYLE)
+        elements.append(table)
+        return elements
+
+    def create_line_chart(self, title, series, x_format='%d s'):
+        """Create a line chart from {series name: [(x, y), ...]}"""
+        drawing = Drawing(450, 230)
+        series = {name: points for name, points in series.items() if points}
+
+        drawing.add(String(225, 212, title, fontSize=12, fontName='Helvetica-Bold', textAnchor='middle'))
+        if not series:
+            drawing.add(String(225, 110, 'Sin datos', fontSize=10, fontName='Helvetica', textAnchor='middle'))
+            return drawing
+
+        plot = LinePlot()
+        plot.x = 40
+        plot.y = 35
+        plot.width = 280
+        plot.height = 160
+        plot.data = list(series.values())
+        for index in range(len(series)):
+            plot.lines[index].strokeColor = SERIES_COLORS[index % len(SERIES_COLORS)]
+            plot.lines[index].strokeWidth = 1.5
+        plot.xValueAxis.labelTextFormat = x_format
+        plot.xValueAxis.labels.fontSize = 7
+        plot.yValueAxis.labels.fontSize = 7
+        plot.yValueAxis.valueMin = 0
+        drawing.add(plot)
+
+        legend = Legend()
+        legend.x = 335
+        legend.y = 195
+        legend.fontSize = 7
+        legend.boxAnchor = 'nw'
+        legend.columnMaximum = 12
+        legend.colorNamePairs = [
+            (SERIES_COLORS[index % len(SERIES_COLORS)], name) for index, name in enumerate(series)
+        ]
+        drawing.add(legend)
+
+        return drawing
+
+    def create_resource_charts(self):
+        """Plot per-endpoint latency over time next to the Mongo and service samples"""
+        timestamps = [sample['timestamp'] for sample in self.resource_samples]
+        timestamps += [entry[0] for entry in self.latency_timeline]
+        start = min(timestamps)
+        gaps = [b['timestamp'] - a['timestamp'] for a, b in zip(self.resource_samples, self.resource_samples[1:])]
+        interval = sorted(gaps)[len(gaps) // 2] if gaps else 1.0
+
+        buckets = {}
+        for timestamp, route, seconds in self.latency_timeline:
+            bucket = int((timestamp - start) / interval)
+            totals = buckets.setdefault(route, {}).setdefault(bucket, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+        latency_series = {
+            route: [((bucket + 0.5) * interval, total / count * 1000) for bucket, (total, count) in sorted(points.items())]
+            for route, points in sorted(buckets.items())
+        }
+
+        def sample_series(section, names):
+            series = {}
+            for name in names:
+                series[name] = [
+                    (sample['timestamp'] - start, sample[section][name])
+                    for sample in self.resource_samples
+                    if isinstance(sample[section].get(name), (int, float))
+                ]
+            return series
+
+        opcounter_series = {}
+        for name in ('op_query', 'op_insert', 'op_update', 'op_delete', 'op_command'):
+            points = sample_series('mongo', [name])[name]
+            opcounter_series[name] = [
+                (x2, max(0.0, (y2 - y1) / (x2 - x1)))
+                for (x1, y1), (x2, y2) in zip(points, points[1:]) if x2 > x1
+            ]
+
+        service_names = []
+        for sample in self.resource_samples:
+            for name in sample['service']:
+                if name not in service_names:
+                    service_names.append(name)
+        service_series = sample_series('service', service_names)
+        service_series = {
+            name: points for name, points in service_series.items()
+            if len({value for _, value in points}) > 1
+        }
+
+        charts = [
+            self.create_line_chart('Latencia media por endpoint (ms)', latency_series),
+            self.create_line_chart('Mongo: cola de bloqueo y clientes activos', sample_series(
+                'mongo', ['queued_readers', 'queued_writers', 'active_clients', 'read_tickets_out', 'write_tickets_out'])),
+            self.create_line_chart('Mongo: operaciones por segundo', opcounter_series),
+            self.create_line_chart('Mongo: conexiones abiertas', sample_series('mongo', ['connections'])),
+        ]
+        if service_series:
+            charts.append(self.create_line_chart('Métricas del servicio', dict(list(service_series.items())[:8])))
+        return charts
+
+    def create_soak_charts(self):
+        """Plot p95 and throughput per endpoint for each soak window"""
+        routes = sorted({route for window in self.latency_windows for route in window})
+        ends = list(itertools.accumulate(self.window_lengths))
+        p95_series = {}
+        rps_series = {}
+        for route in routes:
+            points = [(end, window[route]) for end, window in zip(ends, self.latency_windows) if route in window]
+            p95_series[route] = [(x, stats['p95'] * 1000) for x, stats in points]
+            rps_series[route] = [(x, stats.get('rps', 0.0)) for x, stats in points]
+        return [
+            self.create_line_chart('p95 por ventana (ms)', p95_series),
+            self.create_line_chart('Solicitudes por segundo por ventana', rps_series),
+        ]
+
+    def create_cold_start_section(self):
+        """First-request vs. steady-state latency per endpoint, plus the warm-up curves"""
+        routes = self.cold_start['routes']
+        first = self.cold_start['first']
+        data = [['Endpoint', '1ª petición', f'Media 1-{first}', 'Estable p50', 'Estable p95', 'Factor']]
+        for route, stats in routes.items():
+            data.append([
+                route,
+                f"{stats['first'] * 1000:.1f}",
+                f"{stats['warmup_mean'] * 1000:.1f}",
+                f"{stats['steady_p50'] * 1000:.1f}",
+                f"{stats['steady_p95'] * 1000:.1f}",
+                f"x{stats['penalty']:.1f}",
+            ])
+        table = Table(data, colWidths=[1.5*inch, 0.95*inch, 0.95*inch, 0.95*inch, 0.95*inch, 0.7*inch])
+        table.setStyle(METRIC_TABLE_STYLE)
+
+        elements = []
+        if self.cold_start.get('time_to_ready') is not None:
+            elements.append(Paragraph(f"Tiempo hasta servicio disponible: {self.cold_start['time_to_ready']:.2f} s",
+                                      self.styles['Normal']))
+            elements.append(Spacer(1, 12))
+        elements.append(table)
+        elements.append(Spacer(1, 12))
+        # Only the first few times the warm-up window, so the steady tail doesn't flatten the curve
+        shown = max(first * 3, 10)
+        elements.append(self.create_line_chart('Curva de calentamiento: latencia por petición (ms)', {
+            route: [(index, seconds * 1000) for index, seconds in enumerate(stats['curve'][:shown], start=1)]
+            for route, stats in routes.items()
+        }, x_format='%d'))
+        return elements
+
+    def create_trend_charts(self):
+        """Plot pass rate, total duration and per-endpoint p95 over the runs in the history"""
+        runs = list(enumerate(self.history, start=1))
+        routes = sorted({route for _, run in runs for route in run.get('p95', {})})
+        return [
+            self.create_line_chart('Porcentaje de éxito por ejecución',
+                                   {'Éxito (%)': [(index, run['pass_rate']) for index, run in runs]}, x_format='%d'),
+            self.create_line_chart('Duración total por ejecución (s)',
+                                   {'Duración (s)': [(index, run['duration']) for index, run in runs]}, x_format='%d'),
+            self.create_line_chart('p95 por endpoint y ejecución (ms)', {
+                route: [(index, run['p95'][route] * 1000) for index, run in runs if route in run.get('p95', {})]
+                for route in routes
+            }, x_format='%d'),
+        ]
+
     def generate_report(self, output_path='test_report.pdf'):
         """Generate the complete PDF report"""
         doc = SimpleDocTemplate(output_path, pagesize=letter,
@@ -193,9 +846,115 @@ class TestReportGenerator:
         story.append(Spacer(1, 20))
         
         story.append(self.create_pie_chart(self.test_results))
+
+        if self.latency_metrics:
+            story.append(Paragraph("Latencia por endpoint (ms)", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.append(self.create_latency_table())
+            story.append(Spacer(1, 20))
         
+        if self.payload_metrics:
+            story.append(Paragraph("Tamaño de respuesta y decodificación JSON", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.append(self.create_payload_table())
+            if check_payload_budgets(self.payload_metrics, self.payload_budgets):
+                story.append(Spacer(1, 6))
+                story.append(Paragraph("Los valores en rojo superan el presupuesto de tamaño o decodificación.",
+                                       self.styles['Normal']))
+            if check_payload_regressions(self.payload_metrics, self.payload_baseline):
+                story.append(Spacer(1, 6))
+                story.append(Paragraph(
+                    "Los valores en naranja superan la línea base (mediana de las ejecuciones anteriores) en más de "
+                    f"un {PAYLOAD_REGRESSION_TOLERANCE['max_body_bytes']:.0%} en tamaño o un "
+                    f"{PAYLOAD_REGRESSION_TOLERANCE['decode_ms']:.0%} en decodificación.", self.styles['Normal']))
+            story.append(Spacer(1, 20))
+
+        if self.connection_metrics:
+            story.append(Paragraph("Reutilización de conexiones HTTP", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.append(self.create_connection_table())
+            story.append(Spacer(1, 20))
+
+        if self.fault_metrics:
+            story.append(Paragraph("Fallos inyectados", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.append(Paragraph("La latencia y los errores de esta ejecución incluyen fallos inyectados "
+                                   "en el cliente; no reflejan el servicio por sí solo.", self.styles['Normal']))
+            story.append(Spacer(1, 6))
+            story.append(self.create_fault_table())
+            story.append(Spacer(1, 20))
+
+        if self.retry_metrics:
+            story.append(Paragraph("Reintentos y timeouts", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.append(Paragraph("La tabla de latencia solo incluye primeros intentos; los reintentos aparecen "
+                                   "como '<endpoint>:retry'. Sobrecoste: tiempo medio añadido por los reintentos "
+                                   "a cada petición reintentada.", self.styles['Normal']))
+            story.append(Spacer(1, 6))
+            story.append(self.create_retry_table())
+            story.append(Spacer(1, 20))
+
         story.append(Paragraph("Resultados Detallados", self.styles['Heading2']))
         story.append(Spacer(1, 12))
-        story.append(self.create_detailed_results())
+        story.extend(self.create_detailed_results())
+
+        if any('stability' in result for result in self.test_results):
+            story.append(Paragraph("Estabilidad de las pruebas", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.extend(self.create_stability_section())
+            story.append(Spacer(1, 20))
+
+        if any(result.get('requests') for result in self.test_results):
+            story.append(PageBreak())
+            story.append(Paragraph("Peticiones por prueba y endpoint", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.extend(self.create_request_sections())
+
+        if any('mongo_findings' in result for result in self.test_results):
+            story.append(Paragraph("Consultas Mongo sin índice o lentas", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.append(self.create_mongo_findings_table())
+
+        if self.index_report:
+            story.append(Paragraph("Salud de índices", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.extend(self.create_index_tables())
+
+        if self.cold_start:
+            story.append(Paragraph("Arranque en frío (ms)", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            story.extend(self.create_cold_start_section())
+            story.append(Spacer(1, 20))
+
+        if self.latency_windows:
+            story.append(PageBreak())
+            story.append(Paragraph(f"Prueba de resistencia (ventanas de {self.window_seconds:g} s)",
+                                   self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            for chart in self.create_soak_charts():
+                story.append(chart)
+                story.append(Spacer(1, 12))
+
+        if len(self.history) > 1:
+            story.append(PageBreak())
+            story.append(Paragraph(f"Tendencias (últimas {len(self.history)} ejecuciones)", self.styles['Heading2']))
+            versions = [run.get('service_version') for run in self.history]
+            if any(versions):
+                story.append(Paragraph(
+                    "Versiones del servicio: " + ", ".join(f"{index}: {version or '-'}"
+                                                           for index, version in enumerate(versions, start=1)),
+                    self.styles['Normal']))
+            story.append(Spacer(1, 12))
+            for chart in self.create_trend_charts():
+                story.append(chart)
+                story.append(Spacer(1, 12))
+
+        if self.resource_samples:
+            story.append(PageBreak())
+            story.append(Paragraph("Recursos del servidor vs. latencia", self.styles['Heading2']))
+            story.append(Spacer(1, 12))
+            for chart in self.create_resource_charts():
+                story.append(chart)
+                story.append(Spacer(1, 12))
         
         doc.build(story)
@@ -0,0 +1,86 @@
+import json
+import os
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+"""
+Run history for trend charts and budgeted test selection. Every run appends
+one JSON line to reports/history.jsonl (pass rate, duration, per-endpoint p95
+and payload size/decode time, and per-test outcomes, durations and routes
+hit), so building trends and payload baselines only
+reads that index and never the old PDFs.
+Runs are tagged with a kind ("pytest", "load", ...) and SERVICE_VERSION, if
+set, so load runs are never compared with functional runs, and with the test
+selection ("full", "subset", "time_budget"), so a `-k` or budgeted run does
+not show up as a drop in the trends of full runs.
+"""
+
+HISTORY_PATH = "reports/history.jsonl"
+HISTORY_RUNS = 20
+
+
+def run_record(kind: str, test_results: list, latency_metrics: Optional[dict] = None,
+               payload_metrics: Optional[dict] = None, duration: Optional[float] = None,
+               selection: str = "full") -> dict:
+    """Summarize one run as a history entry.
+
+    `duration` is the run's wall-clock time; without it the per-test durations
+    are summed, which overstates it when tests run concurrently and leaves out
+    fixtures and teardown.
+    """
+    total = len(test_results)
+    passed = sum(1 for result in test_results if result['outcome'] == 'passed')
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "kind": kind,
+        "service_version": os.getenv("SERVICE_VERSION"),
+        "total": total,
+        "passed": passed,
+        "failed": sum(1 for result in test_results if result['outcome'] == 'failed'),
+        "pass_rate": passed / total * 100 if total else 0.0,
+        "selection": selection,
+        "duration": duration if duration is not None else sum(result.get('duration', 0) for result in test_results),
+        "p95": {route: stats["p95"] for route, stats in (latency_metrics or {}).items()},
+        "payload": {
+            route: {"max_body_bytes": stats["max_body_bytes"], "decode_ms": stats["decode_ms"]}
+            for route, stats in (payload_metrics or {}).items()
+        },
+        "tests": {
+            result.get('nodeid', result['name']): {
+                "outcome": result['outcome'],
+                "duration": result.get('duration', 0),
+                "setup": result.get('setup_duration', 0),
+                "routes": sorted(result.get('requests', {})),
+            }
+            for result in test_results
+        },
+    }
+
+def append_run(record: dict, path: str = HISTORY_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+def load_history(path: str = HISTORY_PATH, kind: Optional[str] = None, last: Optional[int] = None,
+                 selection: Optional[str] = None) -> list:
+    """Return the last `last` runs of `kind` and `selection` (all runs if None), oldest first.
+
+    Runs recorded before the selection was stored count as "full".
+    """
+    if not os.path.exists(path):
+        return []
+    runs = deque(maxlen=last)
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a run interrupted mid-write
+            if kind is not None and record.get("kind") != kind:
+                continue
+            if selection is None or record.get("selection", "full") == selection:
+                runs.append(record)
+    return list(runs)
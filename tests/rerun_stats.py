@@ -0,0 +1,47 @@
+import statistics
+
+"""
+Classification of tests re-run with --rerun-count. Tests that both pass and
+fail across the runs are flaky; a run whose setup fails counts as a failed
+run. Tests whose slowest run lies far above the median of their other runs are
+slow outliers, i.e. timing noise rather than a regression. The rest are
+stable. The slowest run is left out of its own baseline, so the rule already
+works with two runs (--rerun-count 2 compares the slow run with the fast one).
+"""
+
+STABLE = "stable"
+FLAKY = "flaky"
+SLOW_OUTLIER = "slow-outlier"
+
+# The slowest run is an outlier when it is this many times the median of the other runs
+# and at least MIN_OUTLIER_SECONDS above it
+SLOW_OUTLIER_FACTOR = 2.0
+MIN_OUTLIER_SECONDS = 0.05
+
+
+def classify_runs(outcomes: list, durations: list) -> dict:
+    """Timing and failure statistics for one test's runs, with its classification"""
+    runs = len(outcomes)
+    failures = sum(1 for outcome in outcomes if outcome == "failed")
+    median = statistics.median(durations)
+    slowest = max(durations)
+    others = sorted(durations)[:-1]
+    baseline = statistics.median(others) if others else slowest
+
+    if 0 < failures < runs:
+        classification = FLAKY
+    elif slowest > baseline * SLOW_OUTLIER_FACTOR and slowest - baseline > MIN_OUTLIER_SECONDS:
+        classification = SLOW_OUTLIER
+    else:
+        classification = STABLE
+
+    return {
+        "runs": runs,
+        "failures": failures,
+        "failure_rate": failures / runs,
+        "mean": statistics.fmean(durations),
+        "median": median,
+        "stdev": statistics.stdev(durations) if runs > 1 else 0.0,
+        "max": slowest,
+        "classification": classification,
+    }
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+import httpx
+from pymongo.errors import PyMongoError
+
+from tests.db import MONGODB_DB_NAME, connect_mongo
+
+"""
+Optional server-side resource sampler. Polls Mongo `serverStatus` and
+`dbStats` for the test database (and a service metrics endpoint, if one is
+configured) on a background thread while the suite runs, so the report can
+line server load up against request latency.
+"""
+
+
+def _dig(document: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(document, dict) or key not in document:
+            return None
+        document = document[key]
+    return document
+
+SERVER_STATUS_FIELDS = {
+    "connections": "connections.current",
+    "active_clients": "globalLock.activeClients.total",
+    "queued_readers": "globalLock.currentQueue.readers",
+    "queued_writers": "globalLock.currentQueue.writers",
+    "read_tickets_out": "wiredTiger.concurrentTransactions.read.out",
+    "write_tickets_out": "wiredTiger.concurrentTransactions.write.out",
+    "resident_mb": "mem.resident",
+    "op_query": "opcounters.query",
+    "op_insert": "opcounters.insert",
+    "op_update": "opcounters.update",
+    "op_delete": "opcounters.delete",
+    "op_command": "opcounters.command",
+}
+DB_STATS_FIELDS = {
+    "objects": "objects",
+    "data_size": "dataSize",
+    "index_size": "indexSize",
+}
+
+
+def parse_metrics(response) -> dict:
+    """Parse a Prometheus text or flat JSON metrics payload into {name: float}"""
+    if "json" in response.headers.get("content-type", ""):
+        return {name: float(value) for name, value in response.json().items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+    metrics = {}
+    for line in response.text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, _, value = line.rpartition(" ")
+        try:
+            metrics[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return metrics
+
+
+class ResourceSampler:
+    """Samples Mongo and service metrics every `interval` seconds on its own thread and event loop."""
+
+    def __init__(self, interval: float = 1.0, metrics_url: Optional[str] = None):
+        self.interval = interval
+        self.metrics_url = metrics_url
+        self.samples = []
+        self.errors = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> list:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        return self.samples
+
+    async def _run(self):
+        mongo = await connect_mongo()
+        db = mongo[MONGODB_DB_NAME]
+        try:
+            async with httpx.AsyncClient(timeout=self.interval) as http:
+                while not self._stop.is_set():
+                    self.samples.append(await self._sample(db, http))
+                    await asyncio.sleep(self.interval)
+        finally:
+            mongo.close()
+
+    async def _sample(self, db, http) -> dict:
+        sample = {"timestamp": time.time(), "mongo": {}, "db": {}, "service": {}}
+        try:
+            status = await db.command("serverStatus")
+            sample["mongo"] = {name: _dig(status, path) for name, path in SERVER_STATUS_FIELDS.items()}
+            stats = await db.command("dbStats")
+            sample["db"] = {name: stats.get(field) for name, field in DB_STATS_FIELDS.items()}
+        except PyMongoError as error:
+            self.errors.append(f"mongo: {error}")
+
+        if self.metrics_url:
+            try:
+                sample["service"] = parse_metrics(await http.get(self.metrics_url))
+            except (httpx.HTTPError, ValueError) as error:
+                self.errors.append(f"service: {error}")
+        return sample
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import random
+from typing import Optional
+
+import httpx
+
+from tests.utils import route_config, route_key
+
+"""
+Client-side timeout and retry policy. RetryingTransport sits on top of the
+instrumented transport and applies a per-route timeout and retry policy with
+exponential backoff (full jitter), bounded by a retry budget shared by every
+route. Each attempt passes through the instrumentation: first attempts are
+recorded under the route itself and retries under "<route>:retry", so
+latency tables show first-attempt latency and the retry overhead is counted
+separately instead of being folded into it. Only latency, status and error
+counts use the ":retry" key; tables keyed by endpoint (payload, connections,
+per-test requests) count retries under the route. Policies are configured per
+route (see utils.route_config):
+
+    {"*": {"timeout": 10, "retries": 0}, "profile": {"retries": 2, "backoff": 0.1}}
+"""
+
+POLICY_FIELDS = ("timeout", "retries", "backoff", "max_backoff", "retry_statuses")
+RETRY_FIELDS = ("requests", "retries", "timeouts", "recovered", "exhausted", "budget_denied", "overhead_seconds")
+RETRY_SUFFIX = ":retry"
+
+# Only read-only or repeatable routes retry by default; registrations, password
+# changes and deletions must never be sent twice behind the test's back. No
+# default timeout: requests keep the client's own (e.g. load_generator --timeout)
+# unless a policy file sets one
+DEFAULT_RETRY_POLICY = {
+    "*": {"retries": 0, "backoff": 0.1, "max_backoff": 2.0, "retry_statuses": [502, 503, 504]},
+    "verify_token": {"retries": 2},
+    "profile": {"retries": 2},
+    "login": {"retries": 2},
+}
+
+
+def load_retry_policy(path: Optional[str] = None) -> dict:
+    """DEFAULT_RETRY_POLICY, with the per-route entries of a JSON policy file laid over it"""
+    if not path:
+        return DEFAULT_RETRY_POLICY
+    with open(path, encoding="utf-8") as handle:
+        policy = json.load(handle)
+    for route, entry in policy.items():
+        unknown = set(entry) - set(POLICY_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown retry policy fields {sorted(unknown)} for {route!r}, expected any of {POLICY_FIELDS}")
+    return {**DEFAULT_RETRY_POLICY, **policy, "*": {**DEFAULT_RETRY_POLICY["*"], **policy.get("*", {})}}
+
+def merge_retry_stats(merged: dict, other: dict):
+    """Add one transport's {route: retry counters} into `merged`"""
+    for route, counts in other.items():
+        totals = merged.setdefault(route, dict.fromkeys(RETRY_FIELDS, 0))
+        for field in RETRY_FIELDS:
+            totals[field] += counts[field]
+
+def retry_summary(stats: dict) -> dict:
+    """Return {route: retry counters and mean overhead ms per retried request} for routes that retried or timed out"""
+    summary = {}
+    for route in sorted(stats):
+        counts = stats[route]
+        if not (counts["retries"] or counts["timeouts"] or counts["budget_denied"]):
+            continue
+        retried = counts["recovered"] + counts["exhausted"]
+        summary[route] = {
+            **{field: counts[field] for field in RETRY_FIELDS if field != "overhead_seconds"},
+            "overhead_ms": counts["overhead_seconds"] / retried * 1000 if retried else 0.0,
+        }
+    return summary
+
+
+class RetryBudget:
+    """Retries allowed across all routes: `min_retries` plus `ratio` of the requests sent so far.
+
+    Keeps a struggling service from being hit with a retry storm on top of the
+    load it is already failing to serve.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_retries: int = 10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+
+    def try_spend(self) -> bool:
+        if self.retries >= self.min_retries + self.ratio * self.requests:
+            return False
+        self.retries += 1
+        return True
+
+
+class RetryingTransport(httpx.AsyncBaseTransport):
+    """Applies the route's timeout, if the policy sets one, to every attempt and retries transport errors and `retry_statuses`.
+
+    Pass shared `stats` and `budget` objects to count and budget across several
+    transports (e.g. one client per test).
+    """
+
+    def __init__(self, policy: dict, transport: httpx.AsyncBaseTransport, budget: Optional[RetryBudget] = None,
+                 stats: Optional[dict] = None, seed: Optional[int] = None):
+        self.policy = policy
+        self.budget = budget or RetryBudget()
+        self.stats = {} if stats is None else stats
+        self._transport = transport
+        self._random = random.Random(seed)
+
+    def _attempt(self, request, extensions: dict, route: str, attempt: int, timeout: Optional[float]):
+        # Every attempt starts from the caller's extensions, so nothing set by inner transports carries over
+        request.extensions = dict(extensions)
+        if timeout is not None:
+            request.extensions["timeout"] = dict.fromkeys(("connect", "read", "write", "pool"), timeout)
+        if attempt:
+            request.extensions["route"] = route + RETRY_SUFFIX
+        return self._transport.handle_async_request(request)
+
+    async def handle_async_request(self, request):
+        route = route_key(request.method, request.url.path)
+        policy = route_config(self.policy, route)
+        counts = self.stats.get(route)
+        if counts is None:
+            counts = self.stats[route] = dict.fromkeys(RETRY_FIELDS, 0)
+        counts["requests"] += 1
+        self.budget.requests += 1
+
+        retry_statuses = set(policy.get("retry_statuses", ()))
+        extensions = request.extensions
+        replayable = isinstance(request.stream, httpx.ByteStream)
+        first_attempt_done = None
+        attempt = 0
+        while True:
+            try:
+                response = await self._attempt(request, extensions, route, attempt, policy.get("timeout"))
+                error = None
+            except httpx.TransportError as exc:
+                response, error = None, exc
+                counts["timeouts"] += isinstance(exc, httpx.TimeoutException)
+            if first_attempt_done is None:
+                first_attempt_done = asyncio.get_running_loop().time()
+
+            failed = error is not None or response.status_code in retry_statuses
+            if not failed or attempt >= policy.get("retries", 0) or not replayable:
+                break
+            if not self.budget.try_spend():
+                counts["budget_denied"] += 1
+                break
+            if response is not None:
+                await response.aclose()
+            attempt += 1
+            counts["retries"] += 1
+            ceiling = min(policy.get("max_backoff", 2.0), policy.get("backoff", 0.1) * 2 ** (attempt - 1))
+            await asyncio.sleep(self._random.uniform(0, ceiling))
+
+        if attempt:
+            counts["overhead_seconds"] += asyncio.get_running_loop().time() - first_attempt_done
+            if failed:
+                counts["exhausted"] += 1
+            else:
+                counts["recovered"] += 1
+        if error is not None:
+            raise error
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -1,6 +1,9 @@
 import pytest
+from json_codec import response_json
 from utils import ROUTES, auth_headers, generate_unique_email, get_auth_token
 
+pytestmark = pytest.mark.destructive
+
 """
 Tests for password change functionality. Validates the process of changing user
 passwords, including verification of current password, password strength
@@ -25,8 +28,8 @@ async def test_successful_password_change(client):
     )
 
     assert response.status_code == 200
-    assert response.json()["success"] is True
-    assert "Password changed" in response.json()["message"]
+    assert response_json(response)["success"] is True
+    assert "Password changed" in response_json(response)["message"]
 
     login_response_new = await client.post(ROUTES["login"], json={
         "email": email,
@@ -34,7 +37,7 @@ async def test_successful_password_change(client):
     })
 
     assert login_response_new.status_code == 200
-    assert "token" in login_response_new.json()
+    assert "token" in response_json(login_response_new)
 
 @pytest.mark.anyio
 async def test_change_password_with_wrong_current_password(client):
@@ -1,6 +1,9 @@
 import pytest
+from json_codec import response_json
 from utils import ROUTES, auth_headers, get_auth_token
 
+pytestmark = pytest.mark.destructive
+
 """
 Tests for account deletion functionality. Validates the account deletion process,
 including proper authentication verification and handling of post-deletion
@@ -13,8 +16,8 @@ async def test_delete_account_success(client):
 
     response = await client.delete(ROUTES["delete_account"], headers=auth_headers(token))
     assert response.status_code == 200
-    assert response.json()["success"] is True
-    assert response.json()["message"] == "Account deleted successfully."
+    assert response_json(response)["success"] is True
+    assert response_json(response)["message"] == "Account deleted successfully."
 
     after_response = await client.get(ROUTES["profile"], headers=auth_headers(token))
     assert after_response.status_code == 401
@@ -1,4 +1,5 @@
 import pytest
+from json_codec import response_json
 from utils import ROUTES, generate_unique_email, register_test_user
 
 """
@@ -24,7 +25,7 @@ async def test_forgot_password_with_existing_email(client):
     response = await client.post(ROUTES["forgot_password"], json={"email": email})
 
     assert response.status_code == 200
-    data = response.json()
+    data = response_json(response)
     assert data["success"] is True
     assert data["message"] == "Password reset email sent."
 
@@ -35,7 +36,7 @@ async def test_forgot_password_with_nonexistent_email(client):
     response = await client.post(ROUTES["forgot_password"], json={"email": fake_email})
 
     assert response.status_code == 200
-    data = response.json()
+    data = response_json(response)
     assert data["success"] is True
     assert data["message"] == "Password reset email sent."
 
@@ -1,4 +1,5 @@
 import pytest
+from json_codec import response_json
 from utils import ROUTES, auth_headers, get_auth_token
 
 """
@@ -8,13 +9,11 @@ checks.
 """
 
 @pytest.mark.anyio
-async def test_get_profile_owner(client):
-    token = await get_auth_token(client, user_type="owner")
-    
-    response = await client.get(ROUTES["profile"], headers=auth_headers(token))
+async def test_get_profile_owner(client, shared_account):
+    response = await client.get(ROUTES["profile"], headers=auth_headers(shared_account["token"]))
     assert response.status_code == 200
 
-    body = response.json()
+    body = response_json(response)
     assert body["userType"] == "owner"
     assert "name" in body
     assert "email" in body
@@ -23,18 +22,11 @@ async def test_get_profile_owner(client):
     assert "password" not in body
 
 @pytest.mark.anyio
-async def test_get_profile_clinic(client):
-    token = await get_auth_token(
-        client, 
-        user_type="clinic", 
-        name="Clínica Esperanza",
-        locality="Chapinero"
-    )
-
-    response = await client.get(ROUTES["profile"], headers=auth_headers(token))
+async def test_get_profile_clinic(client, shared_clinic_account):
+    response = await client.get(ROUTES["profile"], headers=auth_headers(shared_clinic_account["token"]))
     assert response.status_code == 200
 
-    body = response.json()
+    body = response_json(response)
     assert body["userType"] == "clinic"
     assert body["locality"] == "Chapinero"
     assert "name" in body
@@ -52,6 +44,7 @@ async def test_get_profile_invalid_token(client):
     assert "Invalid Access token." in response.text
 
 @pytest.mark.anyio
+@pytest.mark.destructive
 async def test_get_profile_revoked_token(client):
     token = await get_auth_token(client)
 
@@ -66,3 +59,18 @@ async def test_get_profile_no_auth(client):
     response = await client.get(ROUTES["profile"])
     assert response.status_code == 403
     assert "Not authenticated" in response.text
+
+@pytest.mark.anyio
+async def test_get_profile_lookup_uses_index(client, shared_account, mongo_profile):
+    """With --mongo-profile, fetching the profile must not scan the users collection"""
+    if mongo_profile is None:
+        pytest.skip("Requires --mongo-profile")
+
+    await mongo_profile.collect()
+
+    response = await client.get(ROUTES["profile"], headers=auth_headers(shared_account["token"]))
+    assert response.status_code == 200
+
+    operations = [op for op in await mongo_profile.collect() if op["collection"] == "users"]
+    assert operations, "Profile retrieval did not query the users collection"
+    assert not [op for op in operations if "COLLSCAN" in op["flags"]]
@@ -0,0 +1,42 @@
+import pytest
+from index_health import fetch_indexes, revoked_token_ttl_index, token_lookup_index, unique_email_index
+from utils import ROUTES, auth_headers, get_auth_token
+
+"""
+Tests for index health of the auth collections. Verifies that users has a
+unique email index and that revoked_tokens can be looked up by token/jti and
+expires its entries through a TTL index.
+"""
+
+_touched = False
+
+async def touch_auth_collections(client):
+    """Make sure users and revoked_tokens exist; clean_test_db only empties them, so once per session is enough"""
+    global _touched
+    if _touched:
+        return
+    token = await get_auth_token(client)
+    response = await client.post(ROUTES["logout"], headers=auth_headers(token))
+    assert response.status_code == 200
+    _touched = True
+
+@pytest.mark.anyio
+async def test_users_unique_email_index(client, mongo_db):
+    await touch_auth_collections(client)
+
+    indexes = await fetch_indexes(mongo_db)
+    assert unique_email_index(indexes), f"No unique email index on users: {indexes['users']}"
+
+@pytest.mark.anyio
+async def test_revoked_tokens_lookup_index(client, mongo_db):
+    await touch_auth_collections(client)
+
+    indexes = await fetch_indexes(mongo_db)
+    assert token_lookup_index(indexes), f"No token/jti index on revoked_tokens: {indexes['revoked_tokens']}"
+
+@pytest.mark.anyio
+async def test_revoked_tokens_ttl_index(client, mongo_db):
+    await touch_auth_collections(client)
+
+    indexes = await fetch_indexes(mongo_db)
+    assert revoked_token_ttl_index(indexes), f"No TTL index on revoked_tokens: {indexes['revoked_tokens']}"
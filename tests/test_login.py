@@ -1,5 +1,6 @@
 import pytest
-from utils import ROUTES, generate_unique_email, register_test_user
+from json_codec import response_json
+from utils import DEFAULT_PASSWORD, ROUTES, generate_unique_email, register_test_user
 
 """
 Tests for the authentication login endpoint. Verifies successful login attempts,
@@ -24,7 +25,7 @@ async def test_login_success(client):
     })
 
     assert response.status_code == 200
-    data = response.json()
+    data = response_json(response)
     assert data["success"] is True
     assert "token" in data
     assert data["user"]["email"] == email
@@ -107,4 +108,24 @@ async def test_login_case_sensitivity(client):
         "password": password
     })
     
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+@pytest.mark.anyio
+async def test_login_email_lookup_uses_index(client, mongo_profile):
+    """With --mongo-profile, the login lookup on users must not scan the collection"""
+    if mongo_profile is None:
+        pytest.skip("Requires --mongo-profile")
+
+    email = generate_unique_email("login_index")
+    await register_test_user(client, email=email, name="Index Test")
+    await mongo_profile.collect()
+
+    response = await client.post(ROUTES["login"], json={
+        "email": email,
+        "password": DEFAULT_PASSWORD
+    })
+    assert response.status_code == 200
+
+    operations = [op for op in await mongo_profile.collect() if op["collection"] == "users"]
+    assert operations, "Login did not query the users collection"
+    assert not [op for op in operations if "COLLSCAN" in op["flags"]]
@@ -1,4 +1,5 @@
 import pytest
+from json_codec import response_json
 from utils import ROUTES, auth_headers, get_auth_token
 
 """
@@ -7,6 +8,7 @@ token revocation, and proper handling of invalid logout attempts.
 """
 
 @pytest.mark.anyio
+@pytest.mark.destructive
 async def test_logout_success(client):
     token = await get_auth_token(client)
 
@@ -16,7 +18,7 @@ async def test_logout_success(client):
     )
 
     assert response.status_code == 200
-    data = response.json()
+    data = response_json(response)
     assert data["success"] is True
     assert data["message"] == "Logged out successfully."
 
@@ -31,6 +33,7 @@ async def test_logout_invalid_token(client):
     assert "Invalid token or already expired" in response.text
 
 @pytest.mark.anyio
+@pytest.mark.destructive
 async def test_logout_already_revoked_token(client):
     token = await get_auth_token(client)
 
@@ -1,14 +1,18 @@
 import pytest
+from db_assertions import assert_db_integrity
+from json_codec import response_json
 from utils import ROUTES, auth_headers, generate_unique_email, get_auth_token, register_test_user
 
 """
 Tests for complete user lifecycle scenarios. Verifies end-to-end flows combining
 multiple operations like registration, login, profile updates, and account
-management for both owner and clinic users.
+management for both owner and clinic users. Destructive flows finish with bulk
+DB integrity checks (see db_assertions).
 """
 
 @pytest.mark.anyio
-async def test_complete_user_lifecycle_owner(client):
+@pytest.mark.destructive
+async def test_complete_user_lifecycle_owner(client, mongo_db):
     """Test complete user lifecycle for owner: register -> login -> update -> change password -> delete"""
     email = generate_unique_email("lifecycle_owner")
     initial_password = "InitialPass123!"
@@ -22,7 +26,7 @@ async def test_complete_user_lifecycle_owner(client):
         "address": "Initial Address"
     })
     assert register_response.status_code == 201
-    token = register_response.json()["token"]
+    token = response_json(register_response)["token"]
     
     verify_response = await client.post(ROUTES["verify_token"], headers=auth_headers(token))
     assert verify_response.status_code == 200
@@ -35,7 +39,7 @@ async def test_complete_user_lifecycle_owner(client):
     
     profile_response = await client.get(ROUTES["profile"], headers=auth_headers(token))
     assert profile_response.status_code == 200
-    assert profile_response.json()["userType"] == "owner"
+    assert response_json(profile_response)["userType"] == "owner"
     
     update_response = await client.patch(ROUTES["update_profile"], headers=auth_headers(token), json={
         "name": "Updated Owner Name",
@@ -56,7 +60,7 @@ async def test_complete_user_lifecycle_owner(client):
         "password": new_password
     })
     assert login_response.status_code == 200
-    new_token = login_response.json()["token"]
+    new_token = response_json(login_response)["token"]
     
     delete_response = await client.delete(ROUTES["delete_account"], headers=auth_headers(new_token))
     assert delete_response.status_code == 200
@@ -64,6 +68,8 @@ async def test_complete_user_lifecycle_owner(client):
     profile_after_delete = await client.get(ROUTES["profile"], headers=auth_headers(new_token))
     assert profile_after_delete.status_code == 401
 
+    await assert_db_integrity(mongo_db, deleted_emails=[email])
+
 @pytest.mark.anyio
 async def test_complete_user_lifecycle_clinic(client):
     """Test complete user lifecycle for clinic with locality-specific operations"""
@@ -80,11 +86,11 @@ async def test_complete_user_lifecycle_clinic(client):
         "locality": "Chapinero"
     })
     assert register_response.status_code == 201
-    token = register_response.json()["token"]
+    token = response_json(register_response)["token"]
     
     profile_response = await client.get(ROUTES["profile"], headers=auth_headers(token))
     assert profile_response.status_code == 200
-    profile_data = profile_response.json()
+    profile_data = response_json(profile_response)
     assert profile_data["userType"] == "clinic"
     assert profile_data["locality"] == "Chapinero"
     
@@ -93,12 +99,13 @@ async def test_complete_user_lifecycle_clinic(client):
         "locality": "Usaquén"
     })
     assert update_response.status_code == 200
-    assert update_response.json()["locality"] == "Usaquén"
+    assert response_json(update_response)["locality"] == "Usaquén"
     
     updated_profile = await client.get(ROUTES["profile"], headers=auth_headers(token))
-    assert updated_profile.json()["locality"] == "Usaquén"
+    assert response_json(updated_profile)["locality"] == "Usaquén"
 
 @pytest.mark.anyio
+@pytest.mark.destructive
 async def test_password_reset_flow_complete(client):
     """Test complete password reset flow"""
     email = generate_unique_email("reset_flow")
@@ -117,7 +124,7 @@ async def test_password_reset_flow_complete(client):
     assert forgot_response.status_code == 200
     
     token_response = await client.post(ROUTES["debug_reset_token"], json={"email": email})
-    reset_token = token_response.json()["token"]
+    reset_token = response_json(token_response)["token"]
     
     reset_response = await client.post(ROUTES["reset_password"], json={
         "token": reset_token,
@@ -139,7 +146,8 @@ async def test_password_reset_flow_complete(client):
     assert new_login_response.status_code == 200
 
 @pytest.mark.anyio
-async def test_concurrent_login_logout_flow(client):
+@pytest.mark.destructive
+async def test_concurrent_login_logout_flow(client, mongo_db):
     """Test multiple login sessions and logout behavior"""
     email = generate_unique_email("concurrent")
     password = "ConcurrentPass123!"
@@ -155,7 +163,7 @@ async def test_concurrent_login_logout_flow(client):
             "password": password
         })
         assert login_response.status_code == 200
-        token = login_response.json().get("token")
+        token = response_json(login_response).get("token")
         assert token, "Token missing in login response"
         login_sessions.append(token)
 
@@ -173,6 +181,8 @@ async def test_concurrent_login_logout_flow(client):
         verify_response = await client.post(ROUTES["verify_token"], headers=auth_headers(remaining_token))
         assert verify_response.status_code == 200, f"Token {remaining_token} should still be valid"
 
+    await assert_db_integrity(mongo_db, logged_out_tokens=login_sessions[:1], emails=[email])
+
 
 @pytest.mark.anyio
 async def test_cross_user_type_operations(client):
@@ -1,5 +1,6 @@
 import pytest
-from utils import ROUTES, generate_unique_email
+from json_codec import response_json
+from utils import ROUTES, delete_test_users, generate_unique_email, register_test_users
 
 """
 Tests for the user registration functionality. Validates the registration process
@@ -20,7 +21,7 @@ async def test_register_owner_success(client):
     })
 
     assert response.status_code == 201
-    data = response.json()
+    data = response_json(response)
     assert data["success"] is True
     assert "token" in data
     assert data["user"]["email"] == email
@@ -79,7 +80,7 @@ async def test_register_clinic_success(client):
     })
 
     assert response.status_code == 201
-    data = response.json()
+    data = response_json(response)
     assert data["success"] is True
     assert "token" in data
     assert data["user"]["email"] == email
@@ -189,4 +190,18 @@ async def test_register_clinic_invalid_locality(client):
             data["locality"] = locality
             
         response = await client.post(ROUTES["register_clinic"], json=data)
-        assert response.status_code == 422
\ No newline at end of file
+        assert response.status_code == 422
+
+@pytest.mark.anyio
+async def test_register_many_users_concurrently(client, mongo_db):
+    """Test concurrent registration of a batch of owners and clinics, then bulk cleanup"""
+    specs = [{"email": generate_unique_email("batch")} for _ in range(15)]
+    specs += [{"email": generate_unique_email("batch_clinic"), "user_type": "clinic"} for _ in range(5)]
+
+    results = await register_test_users(client, specs, concurrency=5)
+
+    assert [result["error"] for result in results if not result["ok"]] == []
+    assert len({result["token"] for result in results}) == len(specs)
+
+    deleted = await delete_test_users(mongo_db, emails=[result["email"] for result in results])
+    assert deleted == len(specs)
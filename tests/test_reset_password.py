@@ -1,5 +1,7 @@
 import pytest
-from utils import ROUTES, generate_unique_email, register_test_user
+import uuid
+from json_codec import response_json
+from utils import ROUTES, generate_unique_email, jwt_secret, mint_expired_token, register_test_user
 
 """
 Tests for password reset functionality. Validates the complete password reset flow,
@@ -22,7 +24,7 @@ async def test_successful_password_reset(client):
 
     token_response = await client.post(ROUTES["debug_reset_token"], json={"email": email})
     assert token_response.status_code == 200
-    token = token_response.json()["token"]
+    token = response_json(token_response)["token"]
 
     response = await client.post(ROUTES["reset_password"], json={
         "token": token,
@@ -31,7 +33,7 @@ async def test_successful_password_reset(client):
     })
 
     assert response.status_code == 200
-    data = response.json()
+    data = response_json(response)
     assert data["success"] is True
     assert "Password updated successfully" in data["message"]
 
@@ -61,6 +63,18 @@ async def test_password_reset_with_expired_or_fake_token(client):
     assert response.status_code == 401
     assert "Reset token has expired." in response.text
 
+@pytest.mark.anyio
+@pytest.mark.skipif(not jwt_secret(), reason="JWT_SECRET_KEY not set")
+async def test_password_reset_with_minted_expired_token(client):
+    response = await client.post(ROUTES["reset_password"], json={
+        "token": mint_expired_token(str(uuid.uuid4()), token_type="reset"),
+        "newPassword": "NewPass456!",
+        "confirmPassword": "NewPass456!"
+    })
+
+    assert response.status_code == 401
+    assert "Reset token has expired." in response.text
+
 @pytest.mark.anyio
 async def test_password_reset_with_non_matching_passwords(client):
     email = generate_unique_email("reset")
@@ -74,7 +88,7 @@ async def test_password_reset_with_non_matching_passwords(client):
     )
 
     token_response = await client.post(ROUTES["debug_reset_token"], json={"email": email})
-    token = token_response.json()["token"]
+    token = response_json(token_response)["token"]
 
     response = await client.post(ROUTES["reset_password"], json={
         "token": token,
@@ -98,7 +112,7 @@ async def test_password_reset_with_weak_password(client):
     )
 
     token_response = await client.post(ROUTES["debug_reset_token"], json={"email": email})
-    token = token_response.json()["token"]
+    token = response_json(token_response)["token"]
 
     response = await client.post(ROUTES["reset_password"], json={
         "token": token,
@@ -123,7 +137,7 @@ async def test_reset_token_revocation(client):
     )
 
     token_response = await client.post(ROUTES["debug_reset_token"], json={"email": email})
-    token = token_response.json()["token"]
+    token = response_json(token_response)["token"]
 
     first_response = await client.post(ROUTES["reset_password"], json={
         "token": token,
@@ -132,7 +146,7 @@ async def test_reset_token_revocation(client):
     })
 
     assert first_response.status_code == 200
-    assert first_response.json()["success"] is True
+    assert response_json(first_response)["success"] is True
 
     second_response = await client.post(ROUTES["reset_password"], json={
         "token": token,
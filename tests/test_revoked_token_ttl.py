@@ -0,0 +1,95 @@
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import pytest
+from json_codec import response_json
+from utils import ROUTES, auth_headers, get_auth_token, jwt_secret, mint_token, run_bounded
+
+"""
+Volume test for revoked-token expiry. Revokes a large batch of short-lived,
+locally minted tokens, then samples the revoked_tokens size and verify_token
+latency until the service (TTL index or sweep) has removed the expired
+revocations. Takes minutes, because Mongo's TTL monitor only runs once a
+minute, so it only runs with --run-slow.
+"""
+
+REVOKED_TOKEN_COUNT = int(os.getenv("REVOKED_TOKEN_COUNT", "2000"))
+TOKEN_LIFETIME = int(os.getenv("REVOKED_TOKEN_LIFETIME", "30"))
+# Allowed delay between expiry and removal: one TTL monitor pass plus the deletes themselves
+CLEANUP_GRACE = float(os.getenv("REVOKED_TOKEN_CLEANUP_GRACE", "150"))
+# Slowest acceptable removal rate once cleanup has started, in documents per second
+MIN_CLEANUP_RATE = float(os.getenv("REVOKED_TOKEN_MIN_CLEANUP_RATE", "50"))
+# verify_token at the peak collection size may be at most this much slower than before (revocation lookup is indexed)
+VERIFY_SLOWDOWN = 3.0
+SAMPLE_INTERVAL = 5.0
+VERIFY_SAMPLES = 5
+
+
+async def verify_latency(client, token: str) -> float:
+    """Median verify_token latency over a few requests, in seconds"""
+    timings = []
+    for _ in range(VERIFY_SAMPLES):
+        started = time.perf_counter()
+        response = await client.post(ROUTES["verify_token"], headers=auth_headers(token))
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return statistics.median(timings)
+
+async def watch_revoked_tokens(client, mongo_db, token: str, deadline: float) -> list:
+    """Sample (elapsed s, revoked_tokens size, verify_token p50 s) until the collection is empty or the deadline"""
+    samples = []
+    started = time.monotonic()
+    while True:
+        size = await mongo_db["revoked_tokens"].count_documents({})
+        samples.append((time.monotonic() - started, size, await verify_latency(client, token)))
+        if size == 0 or time.monotonic() >= deadline:
+            return samples
+        await asyncio.sleep(SAMPLE_INTERVAL)
+
+def format_samples(samples: list) -> str:
+    return ", ".join(f"{elapsed:.0f}s: {size} docs / {latency * 1000:.1f} ms" for elapsed, size, latency in samples)
+
+
+@pytest.mark.anyio
+@pytest.mark.slow
+@pytest.mark.skipif(not jwt_secret(), reason="JWT_SECRET_KEY not set")
+async def test_expired_revocations_are_cleaned_up(client, mongo_db):
+    """Revocations of expired tokens must disappear within CLEANUP_GRACE seconds of expiry"""
+    token = await get_auth_token(client)
+    user_id = response_json(await client.post(ROUTES["verify_token"], headers=auth_headers(token)))["user_id"]
+    baseline = await verify_latency(client, token)
+
+    expires_at = time.monotonic() + TOKEN_LIFETIME
+    tokens = [mint_token(user_id, expires_in=TOKEN_LIFETIME, jti=uuid.uuid4().hex) for _ in range(REVOKED_TOKEN_COUNT)]
+
+    async def revoke(short_lived):
+        response = await client.post(ROUTES["logout"], headers=auth_headers(short_lived))
+        return response.status_code
+
+    statuses = await run_bounded(tokens, revoke, concurrency=20)
+    assert time.monotonic() < expires_at, "Revoking took longer than the token lifetime; lower REVOKED_TOKEN_COUNT"
+    assert statuses.count(200) == len(tokens), f"Logout failed for {len(tokens) - statuses.count(200)} tokens"
+
+    peak = await mongo_db["revoked_tokens"].count_documents({})
+    assert peak >= len(tokens), f"Only {peak} revocations stored for {len(tokens)} logouts"
+
+    samples = await watch_revoked_tokens(client, mongo_db, token, expires_at + CLEANUP_GRACE)
+    peak_latency = samples[0][2]
+    assert peak_latency <= max(baseline * VERIFY_SLOWDOWN, baseline + 0.005), (
+        f"verify_token slowed from {baseline * 1000:.1f} to {peak_latency * 1000:.1f} ms with {peak} revocations"
+    )
+
+    elapsed, remaining, _ = samples[-1]
+    assert remaining == 0, (
+        f"{remaining} of {peak} expired revocations still stored {CLEANUP_GRACE:g}s after expiry "
+        f"(baseline verify {baseline * 1000:.1f} ms): {format_samples(samples)}"
+    )
+
+    # Cleanup rate once the TTL pass started, i.e. from the last sample before the first drop
+    first_drop = next(index for index, (_, size, _) in enumerate(samples) if size < peak)
+    started = samples[first_drop - 1][0] if first_drop else 0.0
+    rate = peak / max(elapsed - started, SAMPLE_INTERVAL)
+    assert rate >= MIN_CLEANUP_RATE, f"Cleanup too slow ({rate:.0f} docs/s): {format_samples(samples)}"
@@ -1,4 +1,5 @@
 import pytest
+from json_codec import response_json
 from utils import ROUTES, auth_headers, get_auth_token
 
 """
@@ -18,7 +19,7 @@ async def test_update_profile_owner_success(client):
 
     response = await client.patch(ROUTES["update_profile"], headers=auth_headers(token), json=payload)
     assert response.status_code == 200
-    data = response.json()
+    data = response_json(response)
 
     assert data["name"] == payload["name"]
     assert data["phone"] == payload["phone"]
@@ -27,10 +28,8 @@ async def test_update_profile_owner_success(client):
 
 
 @pytest.mark.anyio
-async def test_update_profile_owner_invalid_locality(client):
-    token = await get_auth_token(client, user_type="owner")
-
-    response = await client.patch(ROUTES["update_profile"], headers=auth_headers(token), json={"locality": "Chapinero"})
+async def test_update_profile_owner_invalid_locality(client, shared_account):
+    response = await client.patch(ROUTES["update_profile"], headers=auth_headers(shared_account["token"]), json={"locality": "Chapinero"})
     assert response.status_code == 400
     assert "Only clinics can update 'locality'." in response.text
 
@@ -45,7 +44,7 @@ async def test_update_profile_clinic_success(client):
 
     response = await client.patch(ROUTES["update_profile"], headers=auth_headers(token), json=payload)
     assert response.status_code == 200
-    data = response.json()
+    data = response_json(response)
 
     assert data["name"] == payload["name"]
     assert data["phone"] == payload["phone"]
@@ -53,13 +52,12 @@ async def test_update_profile_clinic_success(client):
     assert data["userType"] == "clinic"
 
 @pytest.mark.anyio
-async def test_update_profile_invalid_email_format(client):
-    token = await get_auth_token(client)
-
-    response = await client.patch(ROUTES["update_profile"], headers=auth_headers(token), json={"email": "not-an-email"})
+async def test_update_profile_invalid_email_format(client, shared_account):
+    response = await client.patch(ROUTES["update_profile"], headers=auth_headers(shared_account["token"]), json={"email": "not-an-email"})
     assert response.status_code == 422
 
 @pytest.mark.anyio
+@pytest.mark.destructive
 async def test_update_profile_revoked_token(client):
     token = await get_auth_token(client)
     await client.post(ROUTES["logout"], headers=auth_headers(token))
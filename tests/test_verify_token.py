@@ -1,5 +1,6 @@
 import pytest
-from utils import ROUTES, auth_headers, generate_unique_email, get_auth_token
+from json_codec import response_json
+from utils import ROUTES, auth_headers, generate_unique_email, get_auth_token, jwt_secret, mint_expired_token, mint_token, tamper_token
 
 """
 Tests for token verification functionality. Validates the behavior of the token
@@ -8,18 +9,13 @@ various malformed token scenarios.
 """
 
 @pytest.mark.anyio
-async def test_verify_valid_token(client):
-    email = generate_unique_email("verify")
-    password = "ValidToken123!"
-
-    token = await get_auth_token(client, email=email, password=password)
-    
-    response = await client.post(ROUTES["verify_token"], headers=auth_headers(token))
+async def test_verify_valid_token(client, shared_account):
+    response = await client.post(ROUTES["verify_token"], headers=auth_headers(shared_account["token"]))
 
     assert response.status_code == 200
-    body = response.json()
+    body = response_json(response)
     assert body["success"] is True
-    assert body["email"] == email
+    assert body["email"] == shared_account["email"]
     assert body["user_type"] == "owner"
     assert "user_id" in body
 
@@ -33,6 +29,7 @@ async def test_verify_invalid_token(client):
     assert "Invalid Access token." in response.text
 
 @pytest.mark.anyio
+@pytest.mark.destructive
 async def test_verify_revoked_token(client):
     email = generate_unique_email("verify")
     password = "RevokedToken123!"
@@ -63,4 +60,47 @@ async def test_verify_malformed_tokens(client):
     
     for token in malformed_tokens:
         response = await client.post(ROUTES["verify_token"], headers=auth_headers(token))
-        assert response.status_code == 401
\ No newline at end of file
+        assert response.status_code == 401
+
+@pytest.mark.anyio
+async def test_verify_tampered_token(client, shared_account):
+    response = await client.post(ROUTES["verify_token"], headers=auth_headers(tamper_token(shared_account["token"])))
+
+    assert response.status_code == 401
+    assert "Invalid Access token." in response.text
+
+@pytest.mark.anyio
+@pytest.mark.skipif(not jwt_secret(), reason="JWT_SECRET_KEY not set")
+async def test_verify_locally_minted_token(client, shared_account):
+    verify_response = await client.post(ROUTES["verify_token"], headers=auth_headers(shared_account["token"]))
+    user_id = response_json(verify_response)["user_id"]
+
+    response = await client.post(ROUTES["verify_token"], headers=auth_headers(mint_token(user_id)))
+
+    assert response.status_code == 200
+    assert response_json(response)["email"] == shared_account["email"]
+
+@pytest.mark.anyio
+@pytest.mark.skipif(not jwt_secret(), reason="JWT_SECRET_KEY not set")
+async def test_verify_expired_minted_token(client, shared_account):
+    verify_response = await client.post(ROUTES["verify_token"], headers=auth_headers(shared_account["token"]))
+    user_id = response_json(verify_response)["user_id"]
+
+    response = await client.post(ROUTES["verify_token"], headers=auth_headers(mint_expired_token(user_id)))
+
+    assert response.status_code == 401
+
+@pytest.mark.anyio
+async def test_verify_token_lookups_use_indexes(client, shared_account, mongo_profile):
+    """With --mongo-profile, the revocation check and user lookup must not scan their collections"""
+    if mongo_profile is None:
+        pytest.skip("Requires --mongo-profile")
+
+    await mongo_profile.collect()
+
+    response = await client.post(ROUTES["verify_token"], headers=auth_headers(shared_account["token"]))
+    assert response.status_code == 200
+
+    operations = await mongo_profile.collect()
+    assert operations, "verify_token did not query Mongo"
+    assert not [op for op in operations if "COLLSCAN" in op["flags"]]
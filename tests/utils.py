@@ -1,5 +1,15 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
 import uuid
+from functools import lru_cache
 from typing import Optional
+from tests.data_factory import default_factory
+from tests.json_codec import EncodedBody, EncodedFields, json_request, response_json
 
 API_PREFIX = "/api/v1"
 ROUTES = {
@@ -17,12 +27,56 @@ ROUTES = {
     "delete_account": f"{API_PREFIX}/user/account",
 
 }
+ROUTE_METHODS = {
+    "register_owner": "POST",
+    "register_clinic": "POST",
+    "login": "POST",
+    "logout": "POST",
+    "forgot_password": "POST",
+    "reset_password": "POST",
+    "change_password": "PUT",
+    "verify_token": "POST",
+    "debug_reset_token": "POST",
+    "profile": "GET",
+    "update_profile": "PATCH",
+    "delete_account": "DELETE",
+}
+_ROUTE_KEYS = {(method, ROUTES[name]): name for name, method in ROUTE_METHODS.items()}
+
+def route_key(method: str, path: str) -> str:
+    """Map a request to its ROUTES key, falling back to 'METHOD path' for unknown routes"""
+    return _ROUTE_KEYS.get((method.upper(), path), f"{method.upper()} {path}")
+
+def route_config(config: dict, route: str) -> dict:
+    """One route's settings from a per-route config (payload budgets, faults, retry policy).
+
+    Such configs map ROUTES keys to settings, plus a "*" entry that applies to
+    every route; the route's own entry overrides "*" field by field.
+    """
+    return {**config.get("*", {}), **config.get(route, {})}
+
+# Modules whose name is not simply "test_<ROUTES key>"
+MODULE_ROUTES = {
+    "test_register": ["register_owner", "register_clinic"],
+    "test_get_profile": ["profile"],
+    "test_reset_password": ["reset_password", "debug_reset_token"],
+    "test_multi_step": [],
+    "test_indexes": [],
+}
+
+def module_routes(nodeid: str) -> list:
+    """ROUTES keys a test targets, from its module name (see MODULE_ROUTES)"""
+    module = nodeid.split("::", 1)[0].rsplit("/", 1)[-1].removesuffix(".py")
+    if module in MODULE_ROUTES:
+        return MODULE_ROUTES[module]
+    name = module.removeprefix("test_")
+    return [name] if name in ROUTES else []
 
 def auth_headers(token: str) -> dict:
     return {"Authorization": f"Bearer {token}"}
 
 def generate_unique_email(prefix: str = "test") -> str:
-    return f"{prefix}_{uuid.uuid4().hex[:6]}@example.com"
+    return default_factory().email(prefix)
 
 DEFAULT_PASSWORD = "SecurePass123!"
 DEFAULT_USER_DATA = {
@@ -30,13 +84,14 @@ DEFAULT_USER_DATA = {
     "phone": "573001234567",
     "address": "Test Address 123"
 }
+# DEFAULT_USER_DATA is the same in every registration, so it is encoded only once
+_DEFAULT_USER_FIELDS = EncodedFields(DEFAULT_USER_DATA)
 
 async def register_test_user(client, email: Optional[str] = None, password: str = DEFAULT_PASSWORD, user_type: str = "owner", **kwargs):
     if not email:
         email = generate_unique_email()
     
     user_data = {
-        **DEFAULT_USER_DATA,
         "email": email,
         "password": password,
         "confirmPassword": password,
@@ -47,7 +102,9 @@ async def register_test_user(client, email: Optional[str] = None, password: str
         user_data["locality"] = kwargs.get("locality", "Suba")
     
     route = ROUTES["register_clinic"] if user_type == "clinic" else ROUTES["register_owner"]
-    return await client.post(route, json=user_data)
+    if _DEFAULT_USER_FIELDS.keys.isdisjoint(kwargs):
+        return await client.post(route, **_DEFAULT_USER_FIELDS.request(user_data))
+    return await client.post(route, **json_request({**DEFAULT_USER_DATA, **user_data}))
 
 async def get_auth_token(client, email: Optional[str] = None, password: str = DEFAULT_PASSWORD, **kwargs) -> str:
     if not email:
@@ -56,10 +113,129 @@ async def get_auth_token(client, email: Optional[str] = None, password: str = DE
     register_response = await register_test_user(client, email=email, password=password, **kwargs)
     assert register_response.status_code in [200, 201], "User registration failed"
     
-    login_response = await client.post(ROUTES["login"], json={
-        "email": email,
-        "password": password
-    })
+    login_response = await client.post(ROUTES["login"], **login_body(email, password).request())
     assert login_response.status_code == 200, "Login failed"
     
-    return login_response.json()["token"]
+    return response_json(login_response)["token"]
+
+def login_body(email: str, password: str = DEFAULT_PASSWORD) -> EncodedBody:
+    """Login request body; keep it with the user (see load_generator.provision_users) to re-send the same bytes"""
+    return EncodedBody({"email": email, "password": password})
+
+async def run_bounded(items, worker, concurrency: int = 10) -> list:
+    """Await worker(item) for every item with at most `concurrency` in flight, keeping input order"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(item):
+        async with semaphore:
+            return await worker(item)
+
+    return await asyncio.gather(*(bounded(item) for item in items))
+
+def _batch_result(email: str, started: float, response=None, error: Optional[str] = None) -> dict:
+    status_code = response.status_code if response is not None else None
+    if error is None and status_code not in (200, 201):
+        error = f"HTTP {status_code}: {response.text[:200]}"
+    return {
+        "email": email,
+        "ok": error is None,
+        "status_code": status_code,
+        "latency": time.perf_counter() - started,
+        "error": error,
+    }
+
+async def register_test_users(client, specs: list, concurrency: int = 10) -> list:
+    """Register many users concurrently.
+
+    Each spec is a dict of register_test_user keyword arguments (an email is
+    generated if missing). Returns one result per spec, in order, with email,
+    ok, status_code, latency (s), error and, on success, token.
+    """
+    async def register(spec):
+        spec = {"email": generate_unique_email(), **spec}
+        started = time.perf_counter()
+        try:
+            response = await register_test_user(client, **spec)
+        except Exception as error:
+            return _batch_result(spec["email"], started, error=repr(error))
+        result = _batch_result(spec["email"], started, response)
+        if result["ok"]:
+            result["token"] = response_json(response).get("token")
+        return result
+
+    return await run_bounded(specs, register, concurrency)
+
+async def get_auth_tokens(client, specs: list, concurrency: int = 10) -> list:
+    """Register and log in many users concurrently; the batch counterpart of get_auth_token"""
+    async def register_and_login(spec):
+        spec = {"email": generate_unique_email(), "password": DEFAULT_PASSWORD, **spec}
+        started = time.perf_counter()
+        try:
+            register_response = await register_test_user(client, **spec)
+            if register_response.status_code not in (200, 201):
+                return _batch_result(spec["email"], started, register_response)
+            response = await client.post(ROUTES["login"], **login_body(spec["email"], spec["password"]).request())
+        except Exception as error:
+            return _batch_result(spec["email"], started, error=repr(error))
+        result = _batch_result(spec["email"], started, response)
+        if result["ok"]:
+            result["token"] = response_json(response)["token"]
+        return result
+
+    return await run_bounded(specs, register_and_login, concurrency)
+
+async def delete_test_users(db, emails: Optional[list] = None, ids: Optional[list] = None) -> int:
+    """Bulk-delete users created by a batch, by email and/or id, in a single query"""
+    clauses = []
+    if emails:
+        clauses.append({"email": {"$in": list(emails)}})
+    if ids:
+        clauses.append({"_id": {"$in": list(ids)}})
+    if not clauses:
+        return 0
+    result = await db["users"].delete_many({"$or": clauses})
+    return result.deleted_count
+
+def jwt_secret() -> Optional[str]:
+    return os.getenv("JWT_SECRET_KEY")
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64url_json(claims: dict) -> str:
+    return _b64url(json.dumps(claims, separators=(",", ":")).encode())
+
+_JWT_HEADER = _b64url_json({"alg": "HS256", "typ": "JWT"})
+
+@lru_cache(maxsize=4)
+def _signer(secret: str):
+    return hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+def mint_token(sub: str, token_type: str = "access", expires_in: int = 3600, secret: Optional[str] = None, **claims) -> str:
+    """Sign an HS256 token locally with the service's claims layout (sub, exp, type), skipping the login round trip"""
+    secret = secret or jwt_secret()
+    if not secret:
+        raise RuntimeError("JWT_SECRET_KEY is not set; tokens cannot be minted locally")
+
+    signing_input = f"{_JWT_HEADER}.{_b64url_json({'sub': sub, 'exp': int(time.time()) + expires_in, 'type': token_type, **claims})}"
+    signer = _signer(secret).copy()
+    signer.update(signing_input.encode())
+    return f"{signing_input}.{_b64url(signer.digest())}"
+
+def mint_expired_token(sub: str, token_type: str = "access", secret: Optional[str] = None) -> str:
+    return mint_token(sub, token_type=token_type, expires_in=-3600, secret=secret)
+
+def mint_reset_token(sub: str, expires_in: int = 900, secret: Optional[str] = None) -> str:
+    return mint_token(sub, token_type="reset", expires_in=expires_in, secret=secret)
+
+def token_claims(token: str) -> dict:
+    """Decode a token's payload without verifying its signature"""
+    payload = token.split(".")[1]
+    return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+
+def tamper_token(token: str, **claims) -> str:
+    """Rewrite the payload of a signed token (default: a different sub) while keeping the original signature"""
+    header, _, signature = token.split(".")
+    decoded = token_claims(token)
+    decoded.update(claims or {"sub": str(uuid.uuid4())})
+    return f"{header}.{_b64url_json(decoded)}.{signature}"
@@ -0,0 +1,80 @@
+import json
+import random
+from typing import Iterator, Optional
+
+"""
+Workload profiles for load and soak runs: the owner:clinic mix of provisioned
+users, the locality distribution of clinics, and the ratio of profile reads
+to update_profile writes. Profiles are plain JSON so they can be versioned
+next to the benchmarks and shipped to distributed nodes:
+
+    {"owner_weight": 4, "clinic_weight": 1,
+     "locality_weights": {"Chapinero": 3, "Suba": 2},
+     "profile_reads": 9, "profile_writes": 1}
+"""
+
+# Roughly proportional to the population of each Bogotá locality
+DEFAULT_LOCALITY_WEIGHTS = {
+    "Suba": 16, "Kennedy": 13, "Engativá": 10, "Bosa": 9, "Ciudad Bolívar": 8,
+    "Usaquén": 6, "Fontibón": 5, "Rafael Uribe Uribe": 4, "San Cristóbal": 4, "Usme": 4,
+    "Chapinero": 2, "Puente Aranda": 3, "Tunjuelito": 2, "Barrios Unidos": 2, "Teusaquillo": 2,
+    "Antonio Nariño": 1, "Los Mártires": 1, "Santa Fe": 1, "La Candelaria": 1, "Sumapaz": 1,
+}
+
+
+class WorkloadProfile:
+    """Traffic shape for load and soak runs; random draws come from its own seeded generator."""
+
+    def __init__(self, owner_weight: float = 4, clinic_weight: float = 1, locality_weights: Optional[dict] = None,
+                 profile_reads: float = 9, profile_writes: float = 1, seed: int = 0):
+        self.owner_weight = owner_weight
+        self.clinic_weight = clinic_weight
+        self.locality_weights = dict(locality_weights or DEFAULT_LOCALITY_WEIGHTS)
+        self.profile_reads = profile_reads
+        self.profile_writes = profile_writes
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._localities = list(self.locality_weights)
+        self._locality_weights = list(self.locality_weights.values())
+
+    @classmethod
+    def from_dict(cls, data: dict, seed: Optional[int] = None) -> "WorkloadProfile":
+        data = dict(data)
+        if seed is not None:
+            data["seed"] = seed
+        return cls(**data)
+
+    @classmethod
+    def load(cls, path: str) -> "WorkloadProfile":
+        with open(path, encoding="utf-8") as handle:
+            return cls.from_dict(json.load(handle))
+
+    def to_dict(self) -> dict:
+        return {
+            "owner_weight": self.owner_weight,
+            "clinic_weight": self.clinic_weight,
+            "locality_weights": self.locality_weights,
+            "profile_reads": self.profile_reads,
+            "profile_writes": self.profile_writes,
+            "seed": self.seed,
+        }
+
+    def user_type(self) -> str:
+        total = self.owner_weight + self.clinic_weight
+        return "clinic" if self._random.random() * total >= self.owner_weight else "owner"
+
+    def locality(self) -> str:
+        return self._random.choices(self._localities, weights=self._locality_weights)[0]
+
+    def is_profile_write(self) -> bool:
+        total = self.profile_reads + self.profile_writes
+        return self._random.random() * total >= self.profile_reads
+
+    def user_specs(self, factory, count: int, prefix: str = "load") -> Iterator[dict]:
+        """Yield `count` register_test_user specs with this profile's owner:clinic and locality mix"""
+        for _ in range(count):
+            user_type = self.user_type()
+            spec = factory.user(prefix, user_type)
+            if user_type == "clinic":
+                spec["locality"] = self.locality()
+            yield spec